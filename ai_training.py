@@ -1,20 +1,73 @@
 # neat
+import copy
+
 import neat
 import pygame
-from constants import WIDTH, HEIGHT
+from constants import WIDTH, HEIGHT, HEADLESS, RENDER_EVERY, RENDER_VIDEO, TRAINING_LEVEL, TRAINING_WORKERS
 
+from evaluation import ShardedEvaluator
 from game import Game
+from level import Level
+from recorder import render_to_file
+from simulation import init_display
+
+generation = 0
+evaluator = None
+game = None  # Game of the windowed training, reused by every generation
+replay_game = None  # Game showing the best genomes of the headless training
+video_level = None  # Level rendering the best genomes of the headless training to files
 
 
 def main(genomes, config):
-    pygame.init()
-    win = pygame.display.set_mode((WIDTH, HEIGHT))
-    game = Game(win)
-    game.init_bot(genomes=genomes, config=config)
-    game.run()
+    global generation, game
+    if HEADLESS:
+        # Evaluate the whole generation without any window, spread over the worker processes
+        evaluator.evaluate(genomes, config)
+
+        if RENDER_EVERY and generation % RENDER_EVERY == 0:
+            show_best(genomes, config)
+    else:
+        if game is None:
+            pygame.init()
+            win = pygame.display.set_mode((WIDTH, HEIGHT))
+            game = Game(win)
+        game.init_bot(genomes=genomes, config=config)
+        if game.level is not None:
+            # The level of the previous generation is reset instead of loaded again
+            game.create_level(game.level.current_level)
+        game.game_is_on = True
+        game.run()
+    generation += 1
+
+
+def show_best(genomes, config):
+    # Replay the best genome of the generation in a window.
+    # A copy is used so that the replay does not overwrite the fitness used by NEAT.
+    global replay_game, video_level
+    genome_id, best = max(genomes, key=lambda item: item[1].fitness)
+    if RENDER_VIDEO:
+        # Render the replay to a file instead, at full speed and without window (e.g. on a training server)
+        init_display(headless=True)
+        best_genomes = [(genome_id, copy.deepcopy(best))]
+        if video_level is None:
+            video_level = Level(TRAINING_LEVEL, None, None, best_genomes, config)
+        else:
+            video_level.reset(best_genomes, config)
+        render_to_file(video_level, RENDER_VIDEO.format(generation=generation))
+        return
+
+    win = init_display(headless=False)
+    if replay_game is None:
+        replay_game = Game(win)
+    replay_game.win = win
+    replay_game.init_bot(genomes=[(genome_id, copy.deepcopy(best))], config=config)
+    replay_game.create_level(TRAINING_LEVEL)
+    replay_game.game_is_on = True
+    replay_game.run()
 
 
 def run():
+    global evaluator
     config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
                                 neat.DefaultSpeciesSet, neat.DefaultStagnation, 'config.txt')
 
@@ -22,7 +75,13 @@ def run():
     population.add_reporter(neat.StdOutReporter(True))
     stats = neat.StatisticsReporter()
     population.add_reporter(stats)
-    winner = population.run(main)
+    if HEADLESS:
+        evaluator = ShardedEvaluator(TRAINING_WORKERS)
+    try:
+        winner = population.run(main)
+    finally:
+        if evaluator is not None:
+            evaluator.close()
 
 
 if __name__ == '__main__':
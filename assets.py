@@ -0,0 +1,75 @@
+from functools import cache
+
+import pygame
+
+
+# Process-wide cache of the animation frames: every sprite sheet is loaded, rescaled and sliced once
+# and the resulting frames are shared (read-only) by all the tiles, enemies and players using them.
+
+@cache
+def load_sprite_sheet(path, resize_factor):
+    # Load a sprite sheet and rescale it
+    sprite_sheet = pygame.image.load(path).convert_alpha()
+    return pygame.transform.scale_by(sprite_sheet, resize_factor)
+
+
+@cache
+def load_frames(path, resize_factor, frame_size, y, nb_sprite, cell_size=(16, 28), flags=0, flipped=False):
+    # Return the 'nb_sprite' frames of the sprite sheet row starting at 'y' (in sheet pixels) as a tuple of surfaces.
+    # 'cell_size' is the size of a frame on the sheet and 'frame_size' the size of the returned surfaces.
+    if flipped:
+        flipped_frames = []
+        for frame in load_frames(path, resize_factor, frame_size, y, nb_sprite, cell_size, flags):
+            flipped_frame = pygame.transform.flip(frame, True, False)
+            flipped_frame.set_colorkey(frame.get_colorkey())  # The colorkey is not kept by the flip
+            flipped_frames.append(flipped_frame)
+        return tuple(flipped_frames)
+
+    sprite_sheet = load_sprite_sheet(path, resize_factor)
+    cell_width, cell_height = cell_size
+    frames = []
+    for i in range(nb_sprite):
+        surface = pygame.Surface(frame_size, flags).convert_alpha()
+        surface.set_colorkey((0, 0, 0))
+        surface.blit(sprite_sheet, (0, 0), (i * cell_width * resize_factor, y * resize_factor,
+                                            cell_width * resize_factor, cell_height * resize_factor))
+        frames.append(surface)
+    return tuple(frames)
+
+
+@cache
+def load_font(path, size):
+    # Font shared by all the texts of the same size (the menu, the buttons and the screens use the same font)
+    return pygame.font.Font(path, size)
+
+
+@cache
+def scale_image(image, resize_factor):
+    # Rescaled copy of a tile image, shared by all the tiles using the same image
+    return pygame.transform.scale_by(image, resize_factor)
+
+
+@cache
+def load_tileset(path):
+    # Tileset image of a TMX map, not converted: every tile is converted on its own
+    return pygame.image.load(path)
+
+
+@cache
+def load_tile_image(path, rect, flipped_horizontally=False, flipped_vertically=False, flipped_diagonally=False,
+                    colorkey=None):
+    # Tile of a tileset, transformed and converted like pytmx.util_pygame.load_pygame does
+    tile = load_tileset(path).subsurface(rect)
+    if flipped_diagonally:
+        tile = pygame.transform.flip(pygame.transform.rotate(tile, 270), True, False)
+    if flipped_horizontally or flipped_vertically:
+        tile = pygame.transform.flip(tile, flipped_horizontally, flipped_vertically)
+
+    if colorkey:
+        tile = tile.convert()
+        tile.set_colorkey(pygame.Color('#' + colorkey), pygame.RLEACCEL)
+    elif pygame.mask.from_surface(tile, 254).count() == tile.get_width() * tile.get_height():
+        tile = tile.convert()  # No transparent pixel
+    else:
+        tile = tile.convert_alpha()
+    return tile
@@ -0,0 +1,106 @@
+import neat
+import numpy as np
+
+
+# NumPy versions of the NEAT activation functions (same clamping as neat.activations)
+def tanh_activation(z):
+    return np.tanh(np.clip(2.5 * z, -60.0, 60.0))
+
+
+def sigmoid_activation(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(5.0 * z, -60.0, 60.0)))
+
+
+def relu_activation(z):
+    return np.maximum(z, 0.0)
+
+
+def identity_activation(z):
+    return z
+
+
+ACTIVATIONS = {
+    neat.activations.tanh_activation: tanh_activation,
+    neat.activations.sigmoid_activation: sigmoid_activation,
+    neat.activations.relu_activation: relu_activation,
+    neat.activations.identity_activation: identity_activation,
+}
+
+
+class BatchNetwork:
+    # Class that evaluates many neat.nn.FeedForwardNetwork at once.
+    # The nodes of all the networks are stored in a single value array and grouped by depth:
+    # one layer of every network is computed with a few NumPy calls, whatever the number of networks.
+
+    def __init__(self, nets):
+        self.nb_networks = len(nets)
+        self.nb_inputs = len(nets[0].input_nodes) if nets else 0
+        self.nb_outputs = len(nets[0].output_nodes) if nets else 0
+
+        input_indices = []
+        output_indices = []
+        layers = {}  # depth -> (nodes, biases, responses, activations, links)
+        size = 0
+        for net in nets:
+            # Give an index in the value array to every node of the network
+            indices = {}
+            for key in net.input_nodes + net.output_nodes:
+                indices[key] = size
+                size += 1
+            for node, *_ in net.node_evals:
+                if node not in indices:
+                    indices[node] = size
+                    size += 1
+            input_indices.extend(indices[key] for key in net.input_nodes)
+            output_indices.extend(indices[key] for key in net.output_nodes)
+
+            # The node_evals are sorted in a feed forward order: the depth of a node is one more than its inputs
+            depths = {}
+            for node, act_func, agg_func, bias, response, links in net.node_evals:
+                if agg_func is not neat.aggregations.sum_aggregation:
+                    raise ValueError('Only the sum aggregation can be batched')
+                if act_func not in ACTIVATIONS:
+                    raise ValueError(f'Activation function {act_func.__name__} can not be batched')
+
+                depth = 1 + max((depths.get(i, 0) for i, w in links), default=0)
+                depths[node] = depth
+                layer = layers.setdefault(depth, ([], [], [], [], []))
+                layer[0].append(indices[node])
+                layer[1].append(bias)
+                layer[2].append(response)
+                layer[3].append(ACTIVATIONS[act_func])
+                position = len(layer[0]) - 1
+                # Links from nodes that are never evaluated read their default value (0)
+                layer[4].extend((indices.get(i, -1), position, w) for i, w in links)
+
+        self.size = size
+        self.input_indices = np.array(input_indices, dtype=np.int64)
+        self.output_indices = np.array(output_indices, dtype=np.int64)
+
+        # Arrays of every layer, from the inputs to the outputs
+        self.layers = []
+        for depth in sorted(layers):
+            nodes, biases, responses, activations, links = layers[depth]
+            sources = np.array([source for source, _, _ in links], dtype=np.int64)
+            targets = np.array([target for _, target, _ in links], dtype=np.int64)
+            weights = np.array([weight for _, _, weight in links], dtype=np.float64)
+            # Nodes using each activation function
+            groups = [(function, np.array([i for i, f in enumerate(activations) if f is function], dtype=np.int64))
+                      for function in set(activations)]
+            self.layers.append((np.array(nodes, dtype=np.int64), np.array(biases), np.array(responses),
+                                groups, sources, targets, weights))
+
+    def activate(self, inputs):
+        # 'inputs' has one row per network, return the outputs with the same layout
+        # (same result as calling activate on each network)
+        values = np.zeros(self.size + 1)  # The extra last value stays 0, for the links from unevaluated nodes
+        values[self.input_indices] = np.asarray(inputs, dtype=np.float64).ravel()
+
+        for nodes, biases, responses, groups, sources, targets, weights in self.layers:
+            # Weighted sum of the inputs of every node, accumulated in the order of the links like 'sum'
+            sums = np.bincount(targets, weights=values[sources] * weights, minlength=len(nodes))
+            z = biases + responses * sums
+            for function, group in groups:
+                values[nodes[group]] = function(z[group])
+
+        return values[self.output_indices].reshape(self.nb_networks, self.nb_outputs)
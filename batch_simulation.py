@@ -0,0 +1,212 @@
+import neat
+import numpy as np
+
+from batch_network import BatchNetwork
+from constants import *
+from level_compiler import load_level
+from profiler import Profiler
+from termination import TerminationPolicy
+from tile import TileGrid
+from vision import vision_inputs, NB_RAYS, EYE_OFFSET
+
+
+def rect_coordinate(values):
+    # Integer rect coordinates of float positions, rounded like Player.set_position
+    return np.round(values).astype(np.int64)
+
+
+class BatchSimulation:
+    # Training version of a level: the state of every player is stored in NumPy arrays (one row per genome)
+    # and the whole population is moved with vectorized operations. It simulates the same physics as
+    # Level.update for AI players, without sprites, images or sounds: the sprite based Player is only
+    # needed to render a selected individual.
+
+    def __init__(self, current_level, genomes, config, state=None, plateau_time=FITNESS_PLATEAU_TIME):
+        self.current_level = current_level
+
+        # Only the terrain and the spawn are needed, the level is read without loading its images
+        level_data = load_level(current_level)
+        self.terrain_grid = TileGrid.from_layer(level_data.get_layer_by_name('Terrain'),
+                                                level_data.width, level_data.height)
+        for x, y, gid in level_data.get_layer_by_name('Spawn').iter_data():
+            if gid:
+                self.spawn_x = x * TILE_SIZE
+                self.spawn_bottom = (y + 1) * TILE_SIZE
+        self.profiler = Profiler()  # Durations of the phases of update(), named like the ones of Level.update
+
+        self.reset(genomes, config, state, plateau_time)
+
+    def reset(self, genomes, config, state=None, plateau_time=FITNESS_PLATEAU_TIME):
+        # Start a new run with other genomes, without loading the level again. With a WorldState (see
+        # Level.save_state), the run is forked from it: every player starts where its first player was.
+        # A shard of a generation runs with plateau_time=0: the plateau is decided on the whole generation by
+        # ShardedEvaluator (see advance()).
+        self.genomes = genomes
+        self.nb_players = len(genomes)
+
+        # All the networks of the generation, activated at once every step
+        nets = [neat.nn.FeedForwardNetwork.create(genome, config) for _, genome in genomes]
+        self.network = BatchNetwork(nets)
+
+        # Players' state (exact top left corner, like Player.position)
+        self.x = np.full(self.nb_players, self.spawn_x, dtype=float)
+        self.y = np.full(self.nb_players, self.spawn_bottom - PLAYER_HEIGHT, dtype=float)
+        self.vertical_movement = np.zeros(self.nb_players)
+        self.horizontal_movement = np.zeros(self.nb_players)
+        self.on_ground = np.ones(self.nb_players, dtype=bool)
+        self.best_distance = np.zeros(self.nb_players, dtype=np.int64)
+        self.fitness = np.zeros(self.nb_players, dtype=np.int64)
+        self.alive = np.ones(self.nb_players, dtype=bool)
+        self.termination = TerminationPolicy(self.nb_players, plateau_time=plateau_time)
+        self.step_best_fitness = None  # Best fitness of the living players at the last step (None if none lives)
+
+        if state is not None and state.players:
+            player = state.player(0)
+            self.x[:] = player['x']
+            self.y[:] = player['y']
+            self.vertical_movement[:] = player['vertical_movement']
+            self.horizontal_movement[:] = player['horizontal_movement']
+            self.on_ground[:] = player['on_ground']
+            self.best_distance[:] = player['best_distance']
+
+    def update(self, dt):
+        # One physics step of every living player, in the same order as Level.update
+        alive = np.flatnonzero(self.alive)
+        if alive.size == 0:
+            return
+        profiler = self.profiler
+        profiler.start()
+        x = self.x[alive]
+        y = self.y[alive]
+        vertical_movement = self.vertical_movement[alive]
+        on_ground = self.on_ground[alive]
+
+        # AI vision and networks (from the rounded rects, like Player.vision_start_point)
+        rect_x = rect_coordinate(x)
+        eyes = np.stack([rect_x + PLAYER_WIDTH // 2, rect_coordinate(y) + PLAYER_HEIGHT // 2 - EYE_OFFSET], axis=1)
+        inputs = np.zeros((self.nb_players, NB_RAYS))
+        inputs[alive] = vision_inputs(eyes, self.terrain_grid.occupancy)
+        profiler.mark('vision')
+        outputs = self.network.activate(inputs)[alive]
+        profiler.mark('activation')
+
+        # Controls and gravity (Player.get_inputs and Player.apply_gravity)
+        right_threshold, left_threshold, jump_threshold = AI_OUTPUT_THRESHOLDS
+        horizontal_movement = (np.where(outputs[:, 0] > right_threshold, PLAYER_SPEED, 0)
+                               - np.where(outputs[:, 1] > left_threshold, PLAYER_SPEED, 0))
+        jump = (outputs[:, 2] > jump_threshold) & on_ground
+        vertical_movement = np.where(jump, vertical_movement - PLAYER_JUMP_POWER, vertical_movement)
+        on_ground = on_ground & ~jump
+        vertical_movement = vertical_movement + PLAYER_GRAVITY * dt
+
+        # Fitness: one point every time a player goes further than before
+        distance_from_start = rect_x - self.spawn_x
+        progress = distance_from_start > self.best_distance[alive]
+        self.best_distance[alive] = np.where(progress, distance_from_start, self.best_distance[alive])
+        self.fitness[alive] += progress
+        profiler.mark('players')
+
+        # Terrain collisions (swept along each axis)
+        x = self.horizontal_collision(x, y, x + horizontal_movement * dt)
+        y, vertical_movement, on_ground = self.vertical_collision(x, y, y + vertical_movement * dt,
+                                                                  vertical_movement, on_ground)
+
+        self.x[alive] = x
+        self.y[alive] = y
+        self.horizontal_movement[alive] = horizontal_movement
+        self.vertical_movement[alive] = vertical_movement
+        self.on_ground[alive] = on_ground
+        profiler.mark('collision')
+
+        # Players falling out of the map die
+        dead = alive[rect_coordinate(y) > HEIGHT]
+        self.fitness[dead] -= 500
+        self.alive[dead] = False
+
+        # Players that have not gone further for a while are stopped too (without penalty)
+        living = np.flatnonzero(self.alive)
+        self.step_best_fitness = int(self.fitness[living].max()) if living.size else None
+        stalled = self.termination.step(dt, living, self.best_distance[living], self.fitness[living])
+        self.alive[living[stalled]] = False
+        profiler.mark('termination')
+
+    def is_solid(self, rows, columns):
+        # Solid flag of the cells at (rows, columns) (broadcast arrays), the cells outside of the map are empty
+        occupancy = self.terrain_grid.occupancy
+        nb_rows, nb_columns = occupancy.shape
+        inside = (rows >= 0) & (rows < nb_rows) & (columns >= 0) & (columns < nb_columns)
+        return inside & occupancy[rows.clip(0, nb_rows - 1), columns.clip(0, nb_columns - 1)]
+
+    def sweep(self, position, target, size, lanes, lanes_used, horizontal):
+        # Swept collision along one axis for every player, like TileGrid.sweep_x/sweep_y: move from 'position' to
+        # 'target' and stop against the first solid tile. 'lanes' are the rows (horizontal movement) or the columns
+        # (vertical movement) covered by every player, shape (n, k), 'lanes_used' tells which ones are really covered.
+        # Return the reached positions and which players hit a tile.
+        forward = target > position
+        backward = target < position
+        # First and last lines (columns or rows) of cells entered by the front of every player
+        first = np.where(forward, np.ceil((position + size) / TILE_SIZE), np.floor(position / TILE_SIZE) - 1)
+        last = np.where(forward, np.ceil((target + size) / TILE_SIZE) - 1, np.floor(target / TILE_SIZE))
+        first = first.astype(np.int64)
+        last = last.astype(np.int64)
+        step = np.where(forward, 1, -1)
+        count = np.where(forward, last - first + 1, np.where(backward, first - last + 1, 0)).clip(0)
+
+        result = target.copy()
+        hit = np.zeros(len(position), dtype=bool)
+        for k in range(count.max(initial=0)):
+            line = first + step * k
+            if horizontal:
+                solid = self.is_solid(lanes, line[:, np.newaxis])
+            else:
+                solid = self.is_solid(line[:, np.newaxis], lanes)
+            blocked = (k < count) & ~hit & (solid & lanes_used).any(axis=1)
+            hit |= blocked
+            result = np.where(blocked, np.where(forward, line * TILE_SIZE - size, (line + 1) * TILE_SIZE), result)
+        return result, hit
+
+    def horizontal_collision(self, x, y, target_x):
+        # Like Level.horizontal_collision, the players stop against the first tile on their way
+        # (a box of PLAYER_HEIGHT pixels covers at most PLAYER_HEIGHT // TILE_SIZE + 2 rows)
+        rows = np.floor(y / TILE_SIZE).astype(np.int64)[:, np.newaxis] + np.arange(PLAYER_HEIGHT // TILE_SIZE + 2)
+        rows_used = rows <= np.ceil((y + PLAYER_HEIGHT) / TILE_SIZE)[:, np.newaxis] - 1
+        x, hit = self.sweep(x, target_x, PLAYER_WIDTH, rows, rows_used, horizontal=True)
+        return x
+
+    def vertical_collision(self, x, y, target_y, vertical_movement, on_ground):
+        # Like Level.vertical_collision, the first tile below or above the players stops them
+        # (a box of PLAYER_WIDTH pixels covers at most PLAYER_WIDTH // TILE_SIZE + 2 columns)
+        columns = np.floor(x / TILE_SIZE).astype(np.int64)[:, np.newaxis] + np.arange(PLAYER_WIDTH // TILE_SIZE + 2)
+        columns_used = columns <= np.ceil((x + PLAYER_WIDTH) / TILE_SIZE)[:, np.newaxis] - 1
+        y, hit = self.sweep(y, target_y, PLAYER_HEIGHT, columns, columns_used, horizontal=False)
+        on_ground = on_ground | (hit & (vertical_movement > 0))
+        vertical_movement = np.where(hit, 0.0, vertical_movement)
+        return y, vertical_movement, on_ground
+
+    def run(self, dt=FIXED_DT, max_time=None):
+        # Step until every player is stopped, the termination policy ends the generation or 'max_time' seconds have
+        # been simulated, then give the genomes their fitness
+        steps = 0
+        max_steps = round(max_time / dt) if max_time is not None else None
+        while not self.finished() and (max_steps is None or steps < max_steps):
+            self.update(dt)
+            steps += 1
+        self.give_fitness()
+        return steps
+
+    def finished(self):
+        # True when every player is stopped or the termination policy ends the generation
+        return not self.alive.any() or self.termination.generation_over()
+
+    def advance(self, dt, nb_steps):
+        # Step at most 'nb_steps' times (fewer if the run is finished first) and return the best fitness of the living
+        # players at every step, which ShardedEvaluator merges between the shards to decide the fitness plateau
+        best_fitnesses = []
+        while len(best_fitnesses) < nb_steps and not self.finished():
+            self.update(dt)
+            best_fitnesses.append(self.step_best_fitness)
+        return best_fitnesses
+
+    def give_fitness(self):
+        for (_, genome), fitness in zip(self.genomes, self.fitness.tolist()):
+            genome.fitness = fitness
@@ -0,0 +1,217 @@
+# Simulation throughput benchmark: runs Level.update headlessly on every level for several population sizes
+# and reports the steps per second, the time spent in each phase of a step and the peak memory. The same cases are
+# run on BatchSimulation, the simulation of the headless training ('levelN/P/batch' cases).
+# Every case is timed REPEATS times and the best run is reported. Baselines and comparisons time every case
+# COMPARE_REPEATS times and compare the medians, which move much less between invocations than single runs.
+#
+#   python benchmark.py                                  # levels 1 to 3, 1/10/100/500 players
+#   python benchmark.py --levels 1 --players 10 100      # a subset
+#   python benchmark.py --engines batch                  # only the training simulation
+#   python benchmark.py --save baseline.json             # store the results as a baseline
+#   python benchmark.py --compare baseline.json          # fail (exit code 1) if a case got slower
+#   python benchmark.py --compare baseline.json --tolerance 0.4    # on a noisy (shared) machine
+#
+# Short runs (a small --steps) are dominated by noise: keep the default number of steps, or more, when comparing.
+import argparse
+import json
+import multiprocessing
+import random
+import statistics
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from constants import *
+
+LEVELS = (1, 2, 3)
+PLAYER_COUNTS = (1, 10, 100, 500)
+STEPS = 300
+SEED = 0
+ENGINES = ('level', 'batch')  # Level (sprites) and BatchSimulation (headless training)
+REPEATS = 5  # Timed runs of every case, the best one is reported
+COMPARE_REPEATS = 15  # Timed runs of every case with --save or --compare, the medians are compared
+# Relative slowdown of the median steps per second reported as a regression. The median of 15 runs varied by up
+# to 20% between invocations on a shared machine: use --tolerance 0.4 on such a machine.
+TOLERANCE = 0.2
+
+
+def peak_memory():
+    # Peak resident memory of this process in MB (None when it can not be measured)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10  # Bytes on macOS, KB on Linux
+
+
+def run_case(current_level, nb_players, steps, seed, repeats=REPEATS):
+    # Simulate 'steps' physics steps of 'nb_players' random genomes, 'repeats' times from the start of the level
+    # (run in its own process for the peak memory)
+    import neat
+    from level import Level
+    from profiler import Profiler
+    from simulation import init_display
+    from termination import TerminationPolicy
+
+    init_display(headless=True)
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                neat.DefaultSpeciesSet, neat.DefaultStagnation, 'config.txt')
+    genomes = random_genomes(config, nb_players, seed)
+
+    level = Level(current_level, None, None, genomes, config)
+    totals = []
+    best = None
+    for _ in range(repeats):
+        level.reset(genomes, config)
+        # Every case simulates the same number of steps: players are only removed when they fall
+        level.termination = TerminationPolicy(nb_players, stall_time=0, max_time=0, plateau_time=0)
+        # Durations of the phases of Level.update
+        level.profiler = Profiler(enabled=True)
+
+        start = time.perf_counter()
+        for _ in range(steps):
+            level.update(FIXED_DT)
+            level.profiler.end_frame()
+        totals.append(time.perf_counter() - start)
+        if totals[-1] == min(totals):
+            best = dict(level.profiler.totals)
+            best['other'] = max(totals[-1] - sum(best.values()), 0)
+
+    return case_result(steps, totals, best, len(level.players))
+
+
+def run_batch_case(current_level, nb_players, steps, seed, repeats=REPEATS):
+    # Same as run_case with the BatchSimulation used by the headless training
+    import neat
+    from batch_simulation import BatchSimulation
+    from profiler import Profiler
+    from termination import TerminationPolicy
+
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                neat.DefaultSpeciesSet, neat.DefaultStagnation, 'config.txt')
+    genomes = random_genomes(config, nb_players, seed)
+
+    simulation = BatchSimulation(current_level, genomes, config)
+    totals = []
+    best = None
+    for _ in range(repeats):
+        simulation.reset(genomes, config)
+        simulation.termination = TerminationPolicy(nb_players, stall_time=0, max_time=0, plateau_time=0)
+        # Durations of the phases of BatchSimulation.update
+        simulation.profiler = Profiler(enabled=True)
+
+        start = time.perf_counter()
+        for _ in range(steps):
+            simulation.update(FIXED_DT)
+            simulation.profiler.end_frame()
+        totals.append(time.perf_counter() - start)
+        if totals[-1] == min(totals):
+            best = dict(simulation.profiler.totals)
+            best['other'] = max(totals[-1] - sum(best.values()), 0)
+
+    return case_result(steps, totals, best, int(simulation.alive.sum()))
+
+
+def random_genomes(config, nb_players, seed):
+    # New random genomes (neat.Population needs at least 2 genomes to speciate, so they are created directly)
+    random.seed(seed)
+    genomes = []
+    for genome_id in range(1, nb_players + 1):
+        genome = config.genome_type(genome_id)
+        genome.configure_new(config.genome_config)
+        genomes.append((genome_id, genome))
+    return genomes
+
+
+def case_result(steps, totals, phase_times, players_alive):
+    # Result of a case from the duration of its timed runs and the phase durations of the best one
+    return {
+        'steps_per_second': steps / min(totals),
+        'median_steps_per_second': steps / statistics.median(totals),
+        'phases_ms_per_step': {phase: 1000 * duration / steps for phase, duration in phase_times.items()},
+        'players_alive': players_alive,
+        'peak_memory_mb': peak_memory(),
+    }
+
+
+def run_benchmark(levels=LEVELS, player_counts=PLAYER_COUNTS, steps=STEPS, seed=SEED, repeats=REPEATS,
+                  engines=ENGINES):
+    # Run every (level, number of players, engine) case in a new process and return the results by case name
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for current_level in levels:
+        for nb_players in player_counts:
+            for engine in engines:
+                pool = context.Pool(1)
+                try:
+                    case = run_case if engine == 'level' else run_batch_case
+                    result = pool.apply(case, (current_level, nb_players, steps, seed, repeats))
+                finally:
+                    # Let the worker exit by itself: SDL catches the SIGTERM sent by Pool.terminate()
+                    pool.close()
+                    pool.join()
+                name = f'level{current_level}/{nb_players}' + ('/batch' if engine == 'batch' else '')
+                results[name] = result
+                print_result(name, result)
+    return {'steps': steps, 'seed': seed, 'repeats': repeats, 'results': results}
+
+
+def print_result(name, result):
+    phases = ' '.join(f'{phase} {duration:.2f}' for phase, duration in result['phases_ms_per_step'].items())
+    memory = result['peak_memory_mb']
+    memory = 'n/a' if memory is None else f'{memory:.0f} MB'
+    print(f'{name:<18} {result["steps_per_second"]:9.1f} steps/s (median {result["median_steps_per_second"]:9.1f})  '
+          f'alive {result["players_alive"]:<4} peak {memory:<8} ms/step: {phases}')
+
+
+def compare(benchmark, baseline, tolerance=TOLERANCE):
+    # Print the speed of every case relative to the baseline, return the names of the cases that got slower
+    regressions = []
+    for name, result in benchmark['results'].items():
+        if name not in baseline['results']:
+            continue
+        ratio = result['median_steps_per_second'] / baseline['results'][name]['median_steps_per_second']
+        slower = ratio < 1 - tolerance
+        if slower:
+            regressions.append(name)
+        print(f'{name:<18} {ratio:6.2f}x baseline{"  REGRESSION" if slower else ""}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the level simulation')
+    parser.add_argument('--levels', type=int, nargs='+', default=LEVELS)
+    parser.add_argument('--players', type=int, nargs='+', default=PLAYER_COUNTS)
+    parser.add_argument('--steps', type=int, default=STEPS)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES)
+    parser.add_argument('--repeats', type=int,
+                        help=f'timed runs of every case ({REPEATS}, or {COMPARE_REPEATS} with --save or --compare)')
+    parser.add_argument('--save', metavar='JSON', help='write the results to this file')
+    parser.add_argument('--compare', metavar='JSON', help='compare the results with this baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='relative slowdown of the median reported as a regression')
+    args = parser.parse_args()
+    if args.repeats is None:
+        args.repeats = COMPARE_REPEATS if args.save or args.compare else REPEATS
+
+    benchmark = run_benchmark(args.levels, args.players, args.steps, args.seed, args.repeats, args.engines)
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(benchmark, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            baseline = json.load(file)
+        if any(baseline.get(setting) != benchmark[setting] for setting in ('steps', 'seed', 'repeats')):
+            print('Warning: the baseline was run with other settings')
+        if compare(benchmark, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
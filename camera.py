@@ -0,0 +1,81 @@
+from bisect import bisect_left
+
+import pygame
+
+from constants import *
+
+
+class Camera:
+    # Class that holds the world -> screen offset of a level.
+    # Everything is simulated in fixed world coordinates, the offset is only applied when drawing.
+
+    def __init__(self, x=0, y=0):
+        self.x = x  # World coordinates of the top left corner of the screen
+        self.y = y
+
+    def move(self, offset):
+        # Shift the view, a positive offset moves the world to the right/bottom of the screen
+        self.x -= offset[0]
+        self.y -= offset[1]
+
+    def center_on(self, rect):
+        # Place the rect in the center of the screen
+        self.x = rect.centerx - round(WIDTH / 2)
+
+    def scroll(self, rect, horizontal_movement, dt):
+        # Follow a rect moving towards the edges of the screen, return True if the camera moved
+        screen_rect = self.apply(rect)
+        if screen_rect.right > WIDTH / 2 and horizontal_movement > 0:
+            self.x += horizontal_movement * dt
+            return True
+        elif screen_rect.left < WIDTH / 4 and horizontal_movement < 0:
+            self.x += horizontal_movement * dt
+            return True
+        return False
+
+    def viewport(self, margin=VIEW_MARGIN):
+        # World rect seen on the screen, extended by 'margin' pixels on every side
+        x, y = round(self.x), round(self.y)
+        return pygame.Rect(x - margin, y - margin, WIDTH + 2 * margin, HEIGHT + 2 * margin)
+
+    def offset(self):
+        # Integer offset to add to world coordinates to get screen coordinates
+        return -round(self.x), -round(self.y)
+
+    def apply(self, rect):
+        # Screen rect of a world rect
+        offset_x, offset_y = self.offset()
+        return rect.move(offset_x, offset_y)
+
+    def to_screen(self, position):
+        # Screen coordinates of a world position
+        offset_x, offset_y = self.offset()
+        return position[0] + offset_x, position[1] + offset_y
+
+    def draw_group(self, win, group, image=None):
+        # Equivalent of group.draw(win) with the camera offset applied ('group' can also be a list of sprites).
+        # If 'image' is given, every sprite is drawn with it instead of its own image (shared animation frame).
+        offset_x, offset_y = self.offset()
+        if image is None:
+            win.blits([(sprite.image, (sprite.rect.x + offset_x, sprite.rect.y + offset_y)) for sprite in group],
+                      doreturn=False)
+        else:
+            win.blits([(image, (sprite.rect.x + offset_x, sprite.rect.y + offset_y)) for sprite in group],
+                      doreturn=False)
+
+
+class VisibilityIndex:
+    # Class that sorts the sprites of a group that never moves by their x coordinate,
+    # to find the ones inside a viewport without testing every sprite of the level
+
+    def __init__(self, group):
+        self.sprites = sorted(group, key=lambda sprite: sprite.rect.x)
+        self.xs = [sprite.rect.x for sprite in self.sprites]
+        self.max_width = max((sprite.rect.width for sprite in self.sprites), default=0)
+
+    def visible(self, viewport):
+        # Sprites (still alive) intersecting the viewport
+        first = bisect_left(self.xs, viewport.left - self.max_width + 1)
+        last = bisect_left(self.xs, viewport.right)
+        return [sprite for sprite in self.sprites[first:last]
+                if sprite.alive() and viewport.colliderect(sprite.rect)]
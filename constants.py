@@ -11,5 +11,48 @@ SFX_VOLUME = 0
 
 COIN_REQUIRED = 5
 
+VIEW_MARGIN = 2 * TILE_SIZE  # Pixels around the screen in which sprites are still drawn and animated
+
+# Player:
+PLAYER_WIDTH = 49
+PLAYER_HEIGHT = 2 * PLAYER_WIDTH
+PLAYER_SPEED = 550
+PLAYER_GRAVITY = 3000
+PLAYER_JUMP_POWER = 1150
+AI_OUTPUT_THRESHOLDS = (0.2, 0.8, 0.5)  # Network outputs above which the AI goes right, left and jumps
+
 FPS = 60
+FIXED_DT = 1 / FPS  # Duration of one physics step, independent of the real frame time
+MAX_FRAME_TIME = 0.1  # Real time simulated at most per frame to avoid a spiral of death on slow pc
 HUMAN_PLAYING = False
+
+# Profiler:
+PROFILING = False  # Time the phases of every frame and show them on the screen
+PROFILER_WINDOW = 120  # Number of frames of the rolling statistics
+PROFILER_PERCENTILE = 95  # Percentile shown next to the average duration of every phase
+PROFILER_CSV = None  # File receiving the durations of the last frames when the game is closed (None for no file)
+
+# Video export:
+# Instead of a window, the best genomes of a headless training are rendered to this video file (encoded by ffmpeg)
+# or directory (PNG files), '{generation}' being replaced by the generation (None to show them in a window)
+RENDER_VIDEO = None
+RENDER_QUEUE_SIZE = 32  # Rendered frames waiting to be written before the simulation waits for the writer
+RENDER_THREADS = 0  # Threads encoding the PNG files (0 for one per CPU core)
+
+# Startup:
+STARTUP_BUDGET = 0.5  # Seconds from the start of the process to the first frame of the menu (see startup.py)
+
+# Input recording:
+RECORD_INPUTS = None  # File receiving the input log of the last run when the game is closed (None for no file)
+
+# Training:
+HEADLESS = True  # Simulate the NEAT generations without window, drawing or FPS cap
+RENDER_EVERY = 10  # Show the best genome of every N-th generation in a window (0 to never show it)
+TRAINING_LEVEL = 1
+TRAINING_DT = FIXED_DT  # Physics step of the headless generations (the swept collisions allow coarser steps)
+TRAINING_WORKERS = 0  # Processes evaluating a headless generation (0 for one per CPU core, 1 to stay in this process)
+
+# Termination of the generations (simulated seconds, 0 to disable a limit):
+STALL_TIME = 5  # A player that has not gone further for this long is stopped
+FITNESS_PLATEAU_TIME = 15  # A generation is stopped when its best fitness has not improved for this long
+MAX_GENERATION_TIME = 30  # A generation is stopped after this long
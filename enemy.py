@@ -1,9 +1,12 @@
 # Import necessary modules and constants
+from bisect import bisect_left, bisect_right
 from math import floor, sin
 from typing import Optional
 
 import pygame
+from assets import load_frames
 from constants import *
+from sounds import sounds
 from tile import Tile
 
 
@@ -16,19 +19,23 @@ class Enemy(Tile):
         self.horizontal_movement = 0
         self.facing_right = True
         self.status = 'idle'
-        self.animation_sprites = {'idle': [], 'run': [], 'hurt': []}
+        self.animation_sprites = {'idle': (), 'run': (), 'hurt': ()}
+        self.flipped_sprites = {'idle': (), 'run': (), 'hurt': ()}  # Same frames facing left
         self.frame_index = 0
         self.animation_speed = 10
-
-        # Sound effects
-        self.explosion_sfx = pygame.mixer.Sound('assets/sounds/Explosion.wav')
-        self.explosion_sfx.set_volume(SFX_VOLUME)
+        self.position = pygame.math.Vector2(self.rect.topleft)  # Exact top left corner, the rect is rounded from it
+        self.previous_position = tuple(self.position)  # Position before the last physics step, for rendering
+        self.patrol_left = None  # World x limits of the enemy's movement, set by the level (None for no limit)
+        self.patrol_right = None
 
     def animate(self, dt):
         # Function to manage the enemy's displayed image based on its state and animation progress
 
-        # Get the current animation state
-        current_animation = self.animation_sprites[self.status]
+        # Get the current animation state, with the frames flipped if the enemy is facing left
+        if self.facing_right:
+            current_animation = self.animation_sprites[self.status]
+        else:
+            current_animation = self.flipped_sprites[self.status]
 
         # Update the animation frame index
         self.frame_index += self.animation_speed * dt
@@ -38,13 +45,7 @@ class Enemy(Tile):
                 self.kill()
 
         # Retrieve the image for the animation
-        image = current_animation[floor(self.frame_index)]
-
-        # Flip the image if the enemy is facing left
-        if not self.facing_right:
-            image = pygame.transform.flip(image, True, False).convert_alpha()
-
-        self.image = image
+        self.image = current_animation[floor(self.frame_index)]
 
     def get_status(self):
         # Function to change the enemy's state for animations (idle, running, hurt)
@@ -58,14 +59,51 @@ class Enemy(Tile):
                 self.status = 'run'
                 self.facing_right = False
 
+    def set_patrol(self, boundary_columns):
+        # Compute the patrol limits once from the sorted columns of the boundary tiles on the enemy's row:
+        # the enemy walks between the closest boundary on its left and the closest one on its right
+        column = self.rect.x // TILE_SIZE
+        left = bisect_left(boundary_columns, column)
+        right = bisect_right(boundary_columns, column)
+        self.patrol_left = (boundary_columns[left - 1] + 1) * TILE_SIZE if left > 0 else None
+        self.patrol_right = boundary_columns[right] * TILE_SIZE if right < len(boundary_columns) else None
+
+    def check_patrol(self):
+        # Turn around when a patrol limit is reached
+        x = self.position.x
+        if self.horizontal_movement > 0 and self.patrol_right is not None and x + self.rect.width > self.patrol_right:
+            self.set_position(self.patrol_right - self.rect.width, self.position.y)
+            self.horizontal_movement = -self.speed
+        elif self.horizontal_movement < 0 and self.patrol_left is not None and x < self.patrol_left:
+            self.set_position(self.patrol_left, self.position.y)
+            self.horizontal_movement = self.speed
+
+    def set_position(self, x, y):
+        # Move the enemy's top left corner to (x, y) (world coordinates, floats) and round its rect from it
+        self.position.update(x, y)
+        self.rect.topleft = (round(x), round(y))
+
+    def get_state(self):
+        # Values that change during a run, in the order of world_state.ENEMY_FIELDS
+        return (self.position.x, self.position.y, self.horizontal_movement, self.facing_right, self.status,
+                self.frame_index)
+
+    def set_state(self, state):
+        # Put the enemy back in a state returned by get_state()
+        x, y, self.horizontal_movement, self.facing_right, self.status, self.frame_index = state
+        self.set_position(x, y)
+        self.previous_position = (x, y)
+        frames = self.animation_sprites if self.facing_right else self.flipped_sprites
+        self.image = frames[self.status][floor(self.frame_index)]
+
     def move(self, dt):
-        self.rect.x += self.horizontal_movement * dt
+        self.set_position(self.position.x + self.horizontal_movement * dt, self.position.y)
 
     def die(self):
         # Function to handle the enemy's death
         self.horizontal_movement = 0
         self.status = 'hurt'
-        self.explosion_sfx.play()
+        sounds.play('explosion')
         self.frame_index = 2
 
     def update(self, dt):
@@ -84,17 +122,16 @@ class Goomba(Enemy):
         self.status = 'idle'
         self.speed = 200
         self.horizontal_movement = self.speed
-        self.animation_sprites = {'idle': [], 'run': [], 'hurt': []}
+        self.animation_sprites = {'idle': (), 'run': (), 'hurt': ()}
+        self.flipped_sprites = {'idle': (), 'run': (), 'hurt': ()}
         self.frame_index = 0
         self.load_sprites()
         self.image = self.animation_sprites[self.status][0]
 
     def load_sprites(self):
-        # Load Goomba's animation sprites from a sprite sheet
+        # Load Goomba's animation sprites from a sprite sheet (shared by all the Goombas)
 
         sprite_sheet_path = 'assets/animations/enemy.png'
-        sprite_sheet = pygame.image.load(sprite_sheet_path).convert_alpha()
-        sprite_sheet = pygame.transform.scale_by(sprite_sheet, self.resize_factor)
 
         for key in self.animation_sprites:
             if key == 'idle':
@@ -108,14 +145,10 @@ class Goomba(Enemy):
                 nb_sprite = 4
             # Define coordinates on the sprite sheet for each animation type
 
-            for i in range(nb_sprite):
-                surface = pygame.Surface((self.width, self.width)).convert_alpha()
-                surface.set_colorkey((0, 0, 0))
-                surface.blit(sprite_sheet, (0, 0), (
-                    i * 16 * self.resize_factor, y * self.resize_factor, 16 * self.resize_factor,
-                    28 * self.resize_factor))
-
-                self.animation_sprites[key].append(surface)
+            frame_size = (self.width, self.width)
+            self.animation_sprites[key] = load_frames(sprite_sheet_path, self.resize_factor, frame_size, y, nb_sprite)
+            self.flipped_sprites[key] = load_frames(sprite_sheet_path, self.resize_factor, frame_size, y, nb_sprite,
+                                                    flipped=True)
 
 
 # Define a subclass of Enemy for Bee enemies
@@ -124,19 +157,17 @@ class Bee(Enemy):
         super().__init__(x, y, image)
         self.speed = 250
         self.horizontal_movement = self.speed
-        self._y = y * TILE_SIZE
         self.status = 'run'
-        self.animation_sprites = {'run': [], 'hurt': []}
+        self.animation_sprites = {'run': (), 'hurt': ()}
+        self.flipped_sprites = {'run': (), 'hurt': ()}
         self.frame_index = 0
         self.load_sprites()
         self.image = self.animation_sprites[self.status][0]
 
     def load_sprites(self):
-        # Load Bee's animation sprites from a sprite sheet
+        # Load Bee's animation sprites from a sprite sheet (shared by all the Bees)
 
         sprite_sheet_path = 'assets/animations/bee.png'
-        sprite_sheet = pygame.image.load(sprite_sheet_path).convert_alpha()
-        sprite_sheet = pygame.transform.scale_by(sprite_sheet, self.resize_factor)
 
         for key in self.animation_sprites:
             # Define coordinates on the sprite sheet for each animation type
@@ -147,11 +178,7 @@ class Bee(Enemy):
                 y = 16
                 nb_sprite = 3
 
-            for i in range(nb_sprite):
-                surface = pygame.Surface((self.width, self.width)).convert_alpha()
-                surface.set_colorkey((0, 0, 0))
-                surface.blit(sprite_sheet, (0, 0), (
-                    i * 16 * self.resize_factor, y * self.resize_factor, 16 * self.resize_factor,
-                    28 * self.resize_factor))
-
-                self.animation_sprites[key].append(surface)
+            frame_size = (self.width, self.width)
+            self.animation_sprites[key] = load_frames(sprite_sheet_path, self.resize_factor, frame_size, y, nb_sprite)
+            self.flipped_sprites[key] = load_frames(sprite_sheet_path, self.resize_factor, frame_size, y, nb_sprite,
+                                                    flipped=True)
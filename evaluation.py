@@ -0,0 +1,142 @@
+import multiprocessing
+
+import numpy as np
+
+from batch_simulation import BatchSimulation
+from constants import *
+from termination import TerminationPolicy
+
+
+# Simulation of the training level, loaded once per process and reset for every generation
+simulation = None
+
+
+def evaluate_shard(genomes, config, state=None, plateau_time=FITNESS_PLATEAU_TIME):
+    # Simulate genomes (from a WorldState if given) in this process and give them their fitness.
+    # The training simulation has no sprites, so no display is needed.
+    global simulation
+    if simulation is None or simulation.current_level != TRAINING_LEVEL:
+        simulation = BatchSimulation(TRAINING_LEVEL, genomes, config, state, plateau_time)
+    else:
+        simulation.reset(genomes, config, state, plateau_time)
+    simulation.run(dt=TRAINING_DT)
+
+
+def shard_worker(connection):
+    # Worker process: simulates its shard of every generation, a number of steps at a time, as asked by the
+    # ShardedEvaluator. The fitness plateau is decided by the evaluator on the whole generation, not by the shard.
+    shard_simulation = None
+    while (message := connection.recv()) is not None:
+        command, *arguments = message
+        if command == 'start':
+            genomes, config, state = arguments
+            if shard_simulation is None:
+                shard_simulation = BatchSimulation(TRAINING_LEVEL, genomes, config, state, plateau_time=0)
+            else:
+                shard_simulation.reset(genomes, config, state, plateau_time=0)
+        elif command == 'advance':
+            connection.send(shard_simulation.advance(*arguments))
+        elif command == 'fitness':
+            connection.send(shard_simulation.fitness.tolist())
+
+
+class ShardedEvaluator:
+    # Evaluates a NEAT generation by splitting the genomes into one shard per worker process.
+    # With a WorldState of the training level, every generation starts from it instead of the spawn
+    # (e.g. to train on a hard section of a level).
+    #
+    # The shards advance in lock-step rounds so that the fitness plateau (see TerminationPolicy) is decided on the
+    # best fitness of the whole generation: the fitnesses do not depend on the number of workers. A round lasts
+    # until the time at which the plateau would end the generation if the best fitness stopped improving, so no
+    # shard ever steps past the end of the generation.
+
+    def __init__(self, num_workers=0, state=None, plateau_time=FITNESS_PLATEAU_TIME):
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.state = state
+        self.plateau_time = plateau_time
+        self.workers = []  # (process, connection) of every worker
+        if self.num_workers > 1:
+            for _ in range(self.num_workers):
+                connection, worker_connection = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=shard_worker, args=(worker_connection,), daemon=True)
+                process.start()
+                self.workers.append((process, connection))
+
+    def evaluate(self, genomes, config):
+        # Same signature as the function given to neat.Population.run
+        if not self.workers:
+            # Single worker: simulate in this process
+            evaluate_shard(genomes, config, self.state, self.plateau_time)
+            return
+
+        shards = [genomes[i::self.num_workers] for i in range(self.num_workers)]
+        jobs = [(connection, shard) for (_, connection), shard in zip(self.workers, shards) if shard]
+        for connection, shard in jobs:
+            connection.send(('start', shard, config, self.state))
+
+        # Best fitness of the whole generation, with the same float times as the policy of a single simulation
+        plateau = TerminationPolicy(0, stall_time=0, max_time=0, plateau_time=self.plateau_time)
+        no_rows = np.zeros(0, dtype=np.int64)
+        running = [connection for connection, _ in jobs]
+        while running and not plateau.generation_over():
+            nb_steps = plateau.steps_before_plateau(TRAINING_DT)
+            for connection in running:
+                connection.send(('advance', TRAINING_DT, nb_steps))
+            results = [connection.recv() for connection in running]
+            for step in range(max(len(result) for result in results)):
+                best_fitnesses = [result[step] for result in results
+                                  if step < len(result) and result[step] is not None]
+                plateau.step(TRAINING_DT, no_rows, no_rows, best_fitnesses)
+            # A shard that stopped before the end of the round is finished
+            running = [connection for connection, result in zip(running, results) if len(result) == nb_steps]
+
+        for connection, shard in jobs:
+            connection.send(('fitness',))
+            for (_, genome), fitness in zip(shard, connection.recv()):
+                genome.fitness = fitness
+
+    def close(self):
+        for process, connection in self.workers:
+            connection.send(None)
+        for process, connection in self.workers:
+            process.join()
+            connection.close()
+        self.workers = []
+
+
+def check(num_workers=4, plateau_time=3, seed=0):
+    # Evaluate the same random population with 1 and 'num_workers' workers and return True if the fitnesses match
+    import random
+
+    import neat
+
+    random.seed(seed)
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                neat.DefaultSpeciesSet, neat.DefaultStagnation, 'config.txt')
+    genomes = list(neat.Population(config).population.items())
+    fitnesses = []
+    for workers in (1, num_workers):
+        evaluator = ShardedEvaluator(workers, plateau_time=plateau_time)
+        try:
+            evaluator.evaluate(genomes, config)
+        finally:
+            evaluator.close()
+        fitnesses.append([genome.fitness for _, genome in genomes])
+    same = fitnesses[0] == fitnesses[1]
+    print(f'seed {seed}: 1 and {num_workers} workers {"give the same" if same else "DO NOT give the same"} fitnesses')
+    return same
+
+
+if __name__ == '__main__':
+    # Check that the fitnesses do not depend on the number of workers when the fitness plateau is on:
+    #   python evaluation.py --workers 4 --plateau 3 --seeds 0 1 2
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Compare the fitnesses given by 1 and N workers')
+    parser.add_argument('--workers', type=int, default=4, help='number of workers compared with 1 worker')
+    parser.add_argument('--plateau', type=float, default=3, help='fitness plateau time (s)')
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0, 1, 2], help='seeds of the random populations')
+    args = parser.parse_args()
+    if not all([check(args.workers, args.plateau, seed) for seed in args.seeds]):
+        sys.exit(1)
@@ -5,9 +5,8 @@ import pygame.sprite
 from pygame.locals import *
 from constants import *
 from data_loader import get_player_data, update_player_data
-from gameover import VictoryScreen, DefeatScreen
-from level import Level
 from menu import Menu
+from sounds import sounds
 
 # Define the path to the data file
 DATA_PATH = 'data/data.json'
@@ -31,27 +30,29 @@ class Game:
         data = get_player_data(DATA_PATH)
         self.max_level = len(data)
 
-        # Initialize game music
-        self.level_music = pygame.mixer.Sound('assets/sounds/level_music.wav')
-        self.level_music.set_volume(MUSIC_VOLUME)
-        self.menu_music = pygame.mixer.Sound('assets/sounds/menu_music.wav')
-        self.menu_music.set_volume(MUSIC_VOLUME)
-        win_volume = 4 * MUSIC_VOLUME
-        self.win_music = pygame.mixer.Sound('assets/sounds/victory_music.mp3')
-        self.win_music.set_volume(win_volume)
-        death_volume = 4 * MUSIC_VOLUME
-        self.death_music = pygame.mixer.Sound('assets/sounds/death_music.mp3')
-        self.death_music.set_volume(death_volume)
-
         # Menu setup
         self.menu = Menu(self.max_level, 1, self.create_level, data)
-        self.menu_music.play(loops=-1)
+        sounds.play('menu_music', loops=-1)
         self.level = None
         self.game_state = GameState.MENU
 
-        # Gameover screens
-        self.win_screen = VictoryScreen(self.create_level, self.show_menu, self.next_level)
-        self.lose_screen = DefeatScreen(self.create_level, self.show_menu)
+        # Gameover screens, built the first time they are shown
+        self._win_screen = None
+        self._lose_screen = None
+
+    @property
+    def win_screen(self):
+        if self._win_screen is None:
+            from gameover import VictoryScreen
+            self._win_screen = VictoryScreen(self.create_level, self.show_menu, self.next_level)
+        return self._win_screen
+
+    @property
+    def lose_screen(self):
+        if self._lose_screen is None:
+            from gameover import DefeatScreen
+            self._lose_screen = DefeatScreen(self.create_level, self.show_menu)
+        return self._lose_screen
 
     def init_bot(self, genomes=None, config=None):
         self.ai_playing = True
@@ -59,23 +60,44 @@ class Game:
         self.config = config
 
     def create_level(self, current_level):
-        # Stop any playing music, play level music, and create a new level
-        self.death_music.stop()
-        self.win_music.stop()
-        self.menu_music.stop()
-        self.level_music.play(loops=-1)
-        self.level = Level(current_level, self.show_menu, self.show_game_over, self.genomes, self.config)
+        # Stop any playing music, play level music, and create a new level (or reset the loaded one)
+        sounds.stop('death_music')
+        sounds.stop('win_music')
+        sounds.stop('menu_music')
+        sounds.play('level_music', loops=-1)
+        if self.level is not None and self.level.current_level == current_level:
+            self.level.reset(self.genomes, self.config)
+        else:
+            # Imported here: the level brings NEAT and all the simulation code, which the menu does not need
+            from level import Level
+            self.level = Level(current_level, self.show_menu, self.show_game_over, self.genomes, self.config)
+        if RECORD_INPUTS:
+            self.level.start_recording()
         self.game_state = GameState.LEVEL
 
     def run(self):
         clock = pygame.time.Clock()
+        accumulator = 0
         while self.game_is_on:
-            dt = clock.tick(FPS) / 1000  # Calculate time passed since the last frame
+            frame_time = clock.tick(FPS) / 1000  # Calculate time passed since the last frame
             # print(f"FPS: {clock.get_fps()}")
-            dt = min(dt, 0.1)  # Cap the maximum time passed to 0.1 seconds to avoid crash with slow pc
+            accumulator += min(frame_time, MAX_FRAME_TIME)
             self.handle_events()  # Handle game events
-            self.update(dt)  # Update the game state
-            self.draw(self.win)  # Draw the game on the window
+
+            # Consume the elapsed time in fixed steps so the physics does not depend on the frame rate
+            while accumulator >= FIXED_DT and self.game_is_on:
+                self.update(FIXED_DT)  # Update the game state
+                accumulator -= FIXED_DT
+
+            # Draw the game on the window, interpolating between the last two physics steps
+            self.draw(self.win, alpha=accumulator / FIXED_DT)
+            if self.level is not None:
+                self.level.profiler.end_frame()
+
+        if PROFILER_CSV and self.level is not None and self.level.profiler.enabled:
+            self.level.profiler.dump_csv(PROFILER_CSV)
+        if RECORD_INPUTS and self.level is not None and self.level.input_log is not None:
+            self.level.stop_recording().save(RECORD_INPUTS)
 
     def handle_events(self):
         events = pygame.event.get()
@@ -96,29 +118,35 @@ class Game:
             if len(self.level.players) == 0:
                 self.game_is_on = False
                 print("Simulation killed because all players died")
+            elif self.level.generation_over():
+                self.game_is_on = False
+                print("Simulation stopped by the termination policy")
 
-    def draw(self, win):
+    def draw(self, win, alpha=1.0):
         # Draw the game on the window based on the game state
         if self.game_state == GameState.LEVEL:
-            self.level.draw(win)
+            self.level.draw(win, alpha)
         elif self.game_state == GameState.MENU:
             self.menu.draw(win)
         elif self.game_state == GameState.WIN:
             self.win_screen.draw(win)
         elif self.game_state == GameState.LOSE:
             self.lose_screen.draw(win)
+        pygame.display.flip()
+        if self.game_state == GameState.LEVEL:
+            self.level.profiler.mark('display')
 
     def show_menu(self, current_level):
         # Stop music, set the menu to the current level, and play menu music
-        self.death_music.stop()
-        self.win_music.stop()
+        sounds.stop('death_music')
+        sounds.stop('win_music')
         self.menu.max_level = self.max_level
         self.menu.current_level = current_level
         for button in self.menu.buttons:
             button.unselect()
         self.menu.buttons[current_level - 1].select()
-        self.level_music.stop()
-        self.menu_music.play(loops=-1)
+        sounds.stop('level_music')
+        sounds.play('menu_music', loops=-1)
         self.game_state = GameState.MENU
 
     def show_game_over(self, current_level, win=False, nb_coin=0):
@@ -128,12 +156,12 @@ class Game:
         black_filter.set_alpha(200)
         self.win.blit(black_filter, (0, 0))
         pygame.display.flip()
-        self.menu_music.stop()
-        self.level_music.stop()
+        sounds.stop('menu_music')
+        sounds.stop('level_music')
 
         if win:
             self.game_state = GameState.WIN
-            self.win_music.play()
+            sounds.play('win_music')
             if update_player_data(DATA_PATH, current_level, nb_coin):
                 self.menu.update_nb_coins(current_level, nb_coin)
             for button in self.win_screen.buttons:
@@ -143,7 +171,7 @@ class Game:
             self.win_screen.current_level = current_level
         else:
             self.game_state = GameState.LOSE
-            self.death_music.play()
+            sounds.play('death_music')
             for button in self.lose_screen.buttons:
                 button.unselect()
             self.lose_screen.buttons[0].select()
@@ -1,5 +1,6 @@
 # Import necessary libraries
 import pygame
+from assets import load_font
 from ui import Button  # Import the Button class from the 'ui' module
 from constants import *  # Import constant values like WINDOW_WIDTH and HEIGHT
 import os
@@ -17,7 +18,7 @@ class Gameover:
 
         # Title setup
         font_path = 'assets/ui/Retro Gaming.ttf'  # Path to the font file
-        self.font = pygame.font.Font(os.path.join(font_path), 50)  # Create a font with a specific size
+        self.font = load_font(os.path.join(font_path), 50)  # Font shared with the buttons
         self.title_image = None  # Title text image
         self.title_rect = None  # Rectangle to position the title text
 
@@ -71,7 +72,6 @@ class Gameover:
         win.blit(self.title_image, self.title_rect)  # Draw the title text
         for button in self.buttons:
             button.draw(win)  # Draw all buttons
-        pygame.display.flip()  # Update the display
 
 
 # Define the 'DefeatScreen' class, which is a subclass of 'Gameover'
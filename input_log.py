@@ -0,0 +1,43 @@
+import numpy as np
+
+from constants import *
+
+# Bits of the controls of a player during one physics step
+RIGHT = 1
+LEFT = 2
+JUMP = 4
+
+
+class InputLog:
+    # Controls of every player at every physics step of a run, one byte per player and step (RIGHT | LEFT | JUMP),
+    # indexed by the row of the player in the batched network. The physics being deterministic, the log is enough
+    # to simulate the run again from the level's initial state (see replay.py), without NEAT or the networks.
+
+    def __init__(self, current_level, nb_players, dt=FIXED_DT):
+        self.current_level = current_level
+        self.nb_players = nb_players
+        self.dt = dt
+        self.steps: list[bytes] = []  # Controls of the players at every step
+        self.fitnesses = None  # Fitness of every player at the end of the recorded run, to check a replay
+
+    def __len__(self):
+        return len(self.steps)
+
+    def record(self, controls):
+        self.steps.append(bytes(controls))
+
+    def save(self, path):
+        controls = np.frombuffer(b''.join(self.steps), dtype=np.uint8).reshape(len(self.steps), self.nb_players)
+        fitnesses = np.array([] if self.fitnesses is None else self.fitnesses, dtype=np.int64)
+        with open(path, 'wb') as file:
+            np.savez_compressed(file, level=self.current_level, dt=self.dt, controls=controls, fitnesses=fitnesses)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            controls = data['controls']
+            log = cls(int(data['level']), controls.shape[1], float(data['dt']))
+            log.steps = [row.tobytes() for row in controls]
+            if len(data['fitnesses']):
+                log.fitnesses = data['fitnesses'].tolist()
+        return log
@@ -0,0 +1,43 @@
+import pygame
+
+from constants import *
+
+
+class StaticLayerCache:
+    # Class that bakes sprite groups that never change into a few large surfaces.
+    # The level is cut into chunks of 'chunk_width' pixels to bound the size of each surface,
+    # a chunk is baked the first time it becomes visible and then reused every frame.
+
+    def __init__(self, groups, height, chunk_width=WIDTH):
+        self.height = height
+        self.chunk_width = chunk_width
+        self.chunks = {}  # Baked surface of each chunk index
+
+        # Sprites touching each chunk, in drawing order
+        self.chunk_sprites = {}
+        for group in groups:
+            for sprite in group:
+                first = sprite.rect.left // chunk_width
+                last = (sprite.rect.right - 1) // chunk_width
+                for index in range(first, last + 1):
+                    self.chunk_sprites.setdefault(index, []).append(sprite)
+
+    def get_chunk(self, index):
+        chunk = self.chunks.get(index)
+        if chunk is None:
+            # Blit all the tiles of the chunk once on a transparent surface
+            chunk = pygame.Surface((self.chunk_width, self.height), pygame.SRCALPHA)
+            left = index * self.chunk_width
+            chunk.blits([(sprite.image, (sprite.rect.x - left, sprite.rect.y))
+                         for sprite in self.chunk_sprites[index]], doreturn=False)
+            self.chunks[index] = chunk
+        return chunk
+
+    def draw(self, win, camera):
+        # Blit the chunks overlapping the screen, clipped by the window
+        offset_x, offset_y = camera.offset()
+        first = -offset_x // self.chunk_width
+        last = (-offset_x + win.get_width() - 1) // self.chunk_width
+        for index in range(first, last + 1):
+            if index in self.chunk_sprites:
+                win.blit(self.get_chunk(index), (index * self.chunk_width + offset_x, offset_y))
@@ -1,14 +1,22 @@
-import os
-
 import neat
+import numpy as np
 import pygame
-from pytmx.util_pygame import load_pygame
 
+from batch_network import BatchNetwork
+from camera import Camera, VisibilityIndex
+from layer_cache import StaticLayerCache
 from constants import *
 from enemy import Goomba, Bee
+from input_log import InputLog
+from level_compiler import load_level
 from player import Player
-from tile import Tile, AnimatedTile
+from profiler import Profiler
+from sounds import sounds
+from termination import TerminationPolicy
+from tile import Tile, AnimatedTile, AnimationClock, TileGrid
 from ui import LevelUI
+from vision import vision_inputs
+from world_state import WorldState
 
 
 class Level:
@@ -20,17 +28,19 @@ class Level:
 
         # User interface within the level
         self.ui = LevelUI()
+        self.profiler = Profiler()  # Durations of the phases of update() and draw()
         self.nb_coins = 0
+        self.input_log = None  # InputLog being recorded (see start_recording)
+        self.replay = None  # InputLog driving the players instead of their networks (see start_replay)
+        self.replay_step = 0
 
-        # Player setup
+        # Player setup (the Player objects are kept to be reused by reset())
+        self.player_pool: list[Player] = []
         self.players: list[Player] = []
-        for _, genome in genome:
-            net = neat.nn.FeedForwardNetwork.create(genome, config)
-            p = Player(net, genome)
-            p.genome.fitness = 0
-            self.players.append(p)
+        self.create_players(genome, config)
 
         self.scroll = False
+        self.camera = Camera()
         self.nb_goomba = 0
         self.nb_bee = 0
         self.nb_isib = 0
@@ -39,24 +49,124 @@ class Level:
         self.sprite_groups: list[pygame.sprite.Group] = []
         self.setup_level()
 
-        # Sound effects (SFX)
-        coin_volume = 2 * SFX_VOLUME
-        self.coin_sfx = pygame.mixer.Sound('assets/sounds/coin_2.mp3')
-        self.coin_sfx.set_volume(coin_volume)
-
         self.move_camera((-800, 0))
+        self.store_previous_positions()
+        self.initial_state = self.save_state()  # State right after the first load, restored by reset()
+
+    def create_players(self, genomes, config):
+        # One player per genome, reusing the Player objects of the previous generations.
+        # Without 'config' the players have no network (they replay an input log).
+        self.genomes = genomes
+        self.config = config
+        self.players = []
+        for index, (_, genome) in enumerate(genomes):
+            net = neat.nn.FeedForwardNetwork.create(genome, config) if config is not None else None
+            if index < len(self.player_pool):
+                p = self.player_pool[index]
+                p.reset(net, genome)
+            else:
+                p = Player(net, genome)
+                self.player_pool.append(p)
+            p.genome.fitness = 0
+            p.network_index = index  # Row of the player in the batched network
+            self.players.append(p)
+        # All the networks of the generation, activated at once every step
+        self.batch_network = BatchNetwork([player.net for player in self.players]) if config is not None else None
+        if HUMAN_PLAYING:
+            self.termination = TerminationPolicy(len(self.players), stall_time=0, max_time=0, plateau_time=0)
+        else:
+            self.termination = TerminationPolicy(len(self.players))
+
+    def place_players(self):
+        for player in self.players:
+            player.set_position(self.spawn_position[0], self.spawn_position[1] - player.height)
+
+    def save_state(self):
+        # Snapshot of everything that changes during a run (see WorldState), to come back to it with restore_state()
+        return WorldState(
+            players=[player.get_state() for player in self.players],
+            player_rows=[player.network_index for player in self.players],
+            fitnesses=[player.genome.fitness for player in self.players],
+            enemies=[enemy.get_state() for enemy in self.all_enemies],
+            enemies_alive=[enemy.alive() for enemy in self.all_enemies],
+            coins=[coin.alive() for coin in self.all_coins],
+            counters=(self.nb_coins, self.nb_goomba, self.nb_bee, self.nb_isib),
+            camera=(self.camera.x, self.camera.y),
+            clocks=[clock.frame_index for clock in self.clocks],
+            termination=self.termination.save_state())
+
+    def restore_state(self, state, genomes=None, config=None):
+        # Put the level back in a state returned by save_state().
+        # Without 'genomes', the players of the snapshot are restored as they were (they must belong to the current
+        # generation). With 'genomes', the run is forked from the snapshot: one new player per genome, all starting
+        # where the first player of the snapshot was (at the spawn if the snapshot has no player).
+        for enemy, enemy_state, alive in zip(self.all_enemies, state.enemies, state.enemies_alive):
+            enemy.set_state(enemy_state)
+            if alive:
+                self.enemies.add(enemy)
+            else:
+                enemy.kill()
+        for coin, alive in zip(self.all_coins, state.coins):
+            if alive:
+                self.coins.add(coin)
+            else:
+                coin.kill()
+        for clock, frame_index in zip(self.clocks, state.clocks):
+            clock.frame_index = frame_index
+        self.nb_coins, self.nb_goomba, self.nb_bee, self.nb_isib = state.counters
+        self.camera.x, self.camera.y = state.camera
+
+        if genomes is None:
+            self.players = [self.player_pool[row] for row in state.player_rows]
+            for player, player_state, fitness in zip(self.players, state.players, state.fitnesses):
+                player.set_state(player_state)
+                player.genome.fitness = fitness
+            self.termination.restore_state(state.termination)
+        else:
+            self.create_players(genomes, config)
+            if state.players:
+                for player in self.players:
+                    player.set_state(state.players[0])
+            else:
+                self.place_players()
+        self.store_previous_positions()
+
+    def reset(self, genomes=None, config=None):
+        # Put the level back in its state after the first load, with new players for 'genomes' (the same genomes
+        # by default). Nothing is loaded again, so a level can be reused by every generation of a training.
+        self.restore_state(self.initial_state, self.genomes if genomes is None else genomes,
+                           self.config if config is None else config)
+        self.max_distance = float('-inf')
+        self.scroll = False
+
+    def start_recording(self, dt=FIXED_DT):
+        # Record the controls of the players at every step from now on (right after the level is created or reset,
+        # the log is replayed from the initial state)
+        self.input_log = InputLog(self.current_level, len(self.players), dt)
+
+    def stop_recording(self):
+        # Return the recorded log, with the fitnesses reached by the players
+        input_log, self.input_log = self.input_log, None
+        if input_log is not None:
+            input_log.fitnesses = [genome.fitness for _, genome in self.genomes]
+        return input_log
+
+    def start_replay(self, input_log):
+        # Drive the players with the controls of a recorded log (one player per recorded player, see replay.py)
+        self.replay = input_log
+        self.replay_step = 0
 
     def setup_level(self):
         # Function that imports the game map
 
-        # Import the TMX file
-        path = 'assets/levels/level' + str(self.current_level) + '.tmx'  # Retrieve the current level's file
-        level_data = load_pygame(os.path.join(path))
+        # Import the current level's file (compiled from its TMX file the first time)
+        level_data = load_level(self.current_level)
 
         # Terrain:
         layer = level_data.get_layer_by_name('Terrain')
         self.terrain = self.create_sprite_group(layer)
         self.sprite_groups.append(self.terrain)
+        self.terrain_grid = TileGrid.from_layer(layer, level_data.width, level_data.height)
 
         # Decoration:
         layer = level_data.get_layer_by_name('Decoration')
@@ -74,8 +184,8 @@ class Level:
             player_spawn_x = x * TILE_SIZE
             self.spawn_x = player_spawn_x
             player_spawn_y = (y + 1) * TILE_SIZE
-            for player in self.players:
-                player.rect.bottomleft = (player_spawn_x, player_spawn_y)
+            self.spawn_position = (player_spawn_x, player_spawn_y)
+        self.place_players()
 
         # Enemies
         layer = level_data.get_layer_by_name('Enemies')
@@ -92,29 +202,36 @@ class Level:
             self.enemies.add(tile)  # Add this tile to the group
 
         self.sprite_groups.append(self.enemies)
+        self.all_enemies = self.enemies.sprites()  # Dead enemies included, for the world states
 
-        # Enemy boundaries:
+        # Enemy boundaries: no sprites, every enemy gets the limits of its patrol once
         layer = level_data.get_layer_by_name('EnemyBoundaries')
-        self.enemy_boundaries = self.create_sprite_group(layer)
-        self.sprite_groups.append(self.enemy_boundaries)
+        boundary_columns = {}  # Sorted columns of the boundary tiles of every row
+        for x, y, gid in layer.iter_data():
+            if gid:
+                boundary_columns.setdefault(y, []).append(x)
+        for enemy in self.enemies:
+            enemy.set_patrol(boundary_columns.get(enemy.rect.y // TILE_SIZE, []))
 
         # Coins:
         layer = level_data.get_layer_by_name('Coins')
-        path = 'assets/animations/coin.png'
-        self.coins = self.create_sprite_group(layer, 'animated', path)
+        self.coins_clock = AnimationClock('assets/animations/coin.png')
+        self.coins = self.create_sprite_group(layer, 'animated', self.coins_clock)
         self.sprite_groups.append(self.coins)
+        self.all_coins = self.coins.sprites()  # Collected coins included, for the world states
 
         # Deep water:
         layer = level_data.get_layer_by_name('DeepWater')
-        path = 'assets/animations/deep_water.png'
-        self.deep_water = self.create_sprite_group(layer, 'animated', path)
+        self.deep_water_clock = AnimationClock('assets/animations/deep_water.png')
+        self.deep_water = self.create_sprite_group(layer, 'animated', self.deep_water_clock)
         self.sprite_groups.append(self.deep_water)
 
         # Surface water:
         layer = level_data.get_layer_by_name('SurfaceWater')
-        path = 'assets/animations/surface_water.png'
-        self.surface_water = self.create_sprite_group(layer, 'animated', path)
+        self.surface_water_clock = AnimationClock('assets/animations/surface_water.png')
+        self.surface_water = self.create_sprite_group(layer, 'animated', self.surface_water_clock)
         self.sprite_groups.append(self.surface_water)
+        self.clocks = [self.coins_clock, self.deep_water_clock, self.surface_water_clock]
 
         # Foreground:
         layer = level_data.get_layer_by_name('Foreground')
@@ -131,8 +248,17 @@ class Level:
         self.finish = self.create_sprite_group(layer)
         self.sprite_groups.append(self.finish)
 
+        # Static layers, baked into large surfaces drawn behind and in front of the moving sprites
+        map_height = level_data.height * TILE_SIZE
+        self.back_layers = StaticLayerCache([self.background, self.decoration, self.terrain], map_height)
+        self.front_layers = StaticLayerCache([self.foreground, self.doors], map_height)
+
+        # Animated layers, indexed to only draw the tiles around the screen
+        self.coins_index = VisibilityIndex(self.coins)
+        self.deep_water_index = VisibilityIndex(self.deep_water)
+
     @staticmethod
-    def create_sprite_group(layer, tile_type='static', path=''):
+    def create_sprite_group(layer, tile_type='static', clock=None):
 
         sprite_group = pygame.sprite.Group()
 
@@ -142,41 +268,29 @@ class Level:
                 sprite_group.add(tile)  # Add this tile to the group
 
             elif tile_type == 'animated':
-                tile = AnimatedTile(x, y, surface, path)  # Create a new animated tile
+                tile = AnimatedTile(x, y, surface, clock)  # Create a new animated tile
                 sprite_group.add(tile)  # Add this tile to the group
 
         return sprite_group
 
     def horizontal_collision(self, dt):
+        # Swept collision: the player stops against the first tile on its way, even if it moves more than a tile
         for player in self.players:
-            player.rect.x += player.horizontal_movement * dt
-            collision = pygame.sprite.spritecollide(player, self.terrain, False)
-
-            for tile in collision:
-                if player.horizontal_movement > 0:
-                    player.rect.right = tile.rect.left
-
-                # Collisions on the left of the player
-                elif player.horizontal_movement < 0:
-                    player.rect.left = tile.rect.right
+            x, y = player.position
+            x, hit = self.terrain_grid.sweep_x(player.position, player.rect.size, x + player.horizontal_movement * dt)
+            player.set_position(x, y)
 
     def vertical_collision(self, dt):
-        # Apply the player's vertical movement:
+        # Apply the player's vertical movement, stopped by the first tile below or above it:
         for player in self.players:
-            y_offset = player.vertical_movement * dt
-            player.rect.y += y_offset
-            collision = pygame.sprite.spritecollide(player, self.terrain, False)
-            for tile in collision:
+            x, y = player.position
+            y, hit = self.terrain_grid.sweep_y(player.position, player.rect.size, y + player.vertical_movement * dt)
+            player.set_position(x, y)
+            if hit:
                 # Collisions below the player
                 if player.vertical_movement > 0:
-                    player.rect.bottom = tile.rect.top
-                    player.vertical_movement = 0
                     player.on_ground = True
-
-                # Collisions above the player
-                elif player.vertical_movement < 0:
-                    player.rect.top = tile.rect.bottom
-                    player.vertical_movement = 0
+                player.vertical_movement = 0
 
     def check_coin_collision(self):
         # Function to collect coins when the player touches them
@@ -186,7 +300,7 @@ class Level:
         if collision:
             for coin in collision:
                 self.nb_coins += 1
-                self.coin_sfx.play()
+                sounds.play('coin')
                 coin.kill()
 
                 # MODIFIED HERE
@@ -195,19 +309,9 @@ class Level:
                     self.show_gameover(self.current_level, win=True, nb_coin=self.nb_coins)
 
     def check_enemy_collision(self):
-        for enemy in self.enemies.sprites():
-            collision = pygame.sprite.spritecollide(enemy, self.enemy_boundaries, False)
-            if collision:
-                for tile in collision:
-                    # Collisions on the right of the enemy
-                    if enemy.horizontal_movement > 0:
-                        enemy.rect.right = tile.rect.left
-                        enemy.horizontal_movement = -enemy.speed
-
-                    # Collisions on the left of the enemy
-                    elif enemy.horizontal_movement < 0:
-                        enemy.rect.left = tile.rect.right
-                        enemy.horizontal_movement = enemy.speed
+        # Make the enemies turn around at the limits of their patrol
+        for enemy in self.enemies:
+            enemy.check_patrol()
 
     def check_enemy_collision_with_player(self):
         for enemy in self.enemies.sprites():
@@ -244,68 +348,35 @@ class Level:
             self.show_gameover(self.current_level, win=True, nb_coin=self.nb_coins)
 
     def check_player_death(self):
-        for player in self.players:
+        for player in self.players.copy():  # Copy to not skip the player following a removed one
             if player.rect.top > HEIGHT:
                 player.genome.fitness -= 500
                 # remove player
                 self.players.remove(player)
 
-    def reset_player(self):
-        # Reset the level and the player
+    def check_termination(self, dt):
+        # Stop the players that have not gone further for a while (without penalty, see TerminationPolicy)
+        rows = np.array([player.network_index for player in self.players], dtype=np.int64)
+        best_distances = np.array([player.best_distance for player in self.players], dtype=np.int64)
+        stalled = self.termination.step(dt, rows, best_distances, [player.genome.fitness for player in self.players])
+        if stalled.any():
+            self.players = [player for player, stop in zip(self.players, stalled.tolist()) if not stop]
 
-        self.nb_coins = 0
-        self.player.current_lives = self.player.lives
+    def generation_over(self):
+        # True when every player is stopped or the termination policy ends the generation
+        return not self.players or self.termination.generation_over()
 
-        self.player.vertical_movement = 0
-        self.player.horizontal_movement = 0
-        self.player.rect.x = 0
-        self.player.rect.y = 0
-
-        self.player.on_ground = False
-        self.player.facing_right = True
-        self.player.invincible = False
-        self.player.first_run = True
-
-        self.sprite_groups = []
-        self.setup_level()
-        self.center_camera()
+    def reset_player(self):
+        # Reset the level and the player
+        self.reset()
 
     def center_camera(self):
         # Place the player in the center of the screen
-
-        # Calculate the offset between the center of the screen and the player
-        offset = round(WIDTH / 2 - self.player.rect.centerx)
-
-        # Move the player
-        self.player.rect.centerx += offset
-
-        # Move all other sprites
-        for sprite_group in self.sprite_groups:
-            for sprite in sprite_group:
-                sprite.rect.x += offset
+        self.camera.center_on(self.player.rect)
 
     def camera_scroll(self, dt):
-        # Function that scrolls the camera horizontally
-
-        # Indicator to avoid moving the player if we are moving all other objects
-        self.scroll = False
-        if self.player.rect.right > WIDTH / 2:  # If the player is on the right side of the screen
-            if self.player.horizontal_movement > 0:  # If the player is moving to the right
-                # Move all sprites to the left
-                offset = self.player.horizontal_movement * dt
-                for sprite_group in self.sprite_groups:
-                    for sprite in sprite_group:
-                        sprite.rect.x -= offset
-                        self.scroll = True
-
-        elif self.player.rect.left < WIDTH / 4:  # If the player is on the left side of the screen
-            if self.player.horizontal_movement < 0:  # If the player is moving to the left
-                # Move all sprites to the left
-                offset = self.player.horizontal_movement * dt
-                for sprite_group in self.sprite_groups:
-                    for sprite in sprite_group:
-                        sprite.rect.x -= offset
-                        self.scroll = True
+        # Function that scrolls the camera horizontally when the player gets close to the edges of the screen
+        self.scroll = self.camera.scroll(self.player.rect, self.player.horizontal_movement, dt)
 
     def camera_events(self):
         STRENGTH = 20
@@ -319,60 +390,133 @@ class Level:
         self.move_camera(offset)
 
     def move_camera(self, offset):
-        for group in self.sprite_groups:
-            for sprite in group:
-                sprite.rect.x += offset[0]
-                sprite.rect.y += offset[1]
+        # Only the view moves, the sprites stay in world coordinates
+        self.camera.move(offset)
+
+    def store_previous_positions(self):
+        # Remember where the moving sprites are before a physics step to interpolate their rendering
         for player in self.players:
-            player.rect.x += offset[0]
-            player.rect.y += offset[1]
-        self.spawn_x += offset[0]
+            player.previous_position = tuple(player.position)
+        for enemy in self.enemies:
+            enemy.previous_position = tuple(enemy.position)
 
-    def update(self, dt):
-        self.camera_events()
+    @staticmethod
+    def interpolate(sprite, alpha):
+        # Position between the previous and the current physics step ('alpha' from 0 to 1)
+        previous_x, previous_y = sprite.previous_position
+        return (previous_x + (sprite.position.x - previous_x) * alpha,
+                previous_y + (sprite.position.y - previous_y) * alpha)
+
+    def compute_vision(self):
+        # Eye position and vision inputs of every living player (in the order of self.players)
+        eyes = [player.vision_start_point() for player in self.players]
+        return eyes, vision_inputs(eyes, self.terrain_grid.occupancy)
+
+    def activate_networks(self, inputs):
+        # Outputs of the networks of the living players (in the order of self.players) for their vision inputs
+        rows = [player.network_index for player in self.players]
+        batch_inputs = np.zeros((self.batch_network.nb_networks, inputs.shape[1]))
+        batch_inputs[rows] = inputs
+        return self.batch_network.activate(batch_inputs)[rows].tolist()
+
+    def replay_controls(self):
+        # Give the players their recorded controls of this step (the players stay idle once the log is over)
+        controls = self.replay.steps[self.replay_step] if self.replay_step < len(self.replay) else None
+        self.replay_step += 1
+        for player in self.players:
+            player.forced_controls = controls[player.network_index] if controls is not None else 0
+            player.vision_eye = player.vision_start_point()
 
+    def update_players(self, dt):
+        # Move the players with their last network outputs and reward the ones going further than before
         for player in self.players:
-            player.update_vision(self.terrain)
             player.update(dt)
             distance_from_start = player.rect.x - self.spawn_x
             if distance_from_start > player.best_distance:
                 player.best_distance = distance_from_start
                 player.genome.fitness += 1
+
+        if self.input_log is not None:
+            controls = bytearray(self.input_log.nb_players)  # Stopped players have no controls
+            for player in self.players:
+                controls[player.network_index] = player.controls
+            self.input_log.record(controls)
+
+    def update(self, dt):
+        # 'dt' is the fixed duration of a physics step (FIXED_DT)
+        profiler = self.profiler
+        profiler.start()
+        self.camera_events()
+        self.store_previous_positions()
+        profiler.mark('camera')
+
+        # AI vision and networks of all the players in one vectorized pass
+        if self.replay is not None:
+            self.replay_controls()
+            profiler.mark('replay')
+        elif self.players:
+            eyes, inputs = self.compute_vision()
+            profiler.mark('vision')
+            outputs = self.activate_networks(inputs)
+            for player, eye, player_outputs in zip(self.players, eyes, outputs):
+                player.vision_eye = eye
+                player.network_output = player_outputs
+            profiler.mark('activation')
+
+        self.update_players(dt)
+        profiler.mark('players')
         # self.check_coin_collision()
         # self.check_finish()
         # Update the enemies:
         self.enemies.update(dt)
         self.check_enemy_collision()
+        profiler.mark('enemies')
         # Player collisions
         self.horizontal_collision(dt)
         self.vertical_collision(dt)
+        profiler.mark('collision')
 
-        # water
-        self.surface_water.update()
-        self.deep_water.update()
+        # water (one shared frame per animation, whatever the number of tiles)
+        self.surface_water_clock.tick()
+        self.deep_water_clock.tick()
 
         self.check_player_death()
+        self.check_termination(dt)
+        profiler.mark('termination')
 
-    def draw(self, win):
+    def draw(self, win, alpha=1.0):
+        # Draw the level on 'win' (the window or an offscreen surface), the caller updates the display
+        profiler = self.profiler
+        profiler.start()
         self.win = win
         win.fill((51, 165, 255))  # Fill the window with a blue background
 
-        self.background.draw(win)
-        self.decoration.draw(win)
-        self.terrain.draw(win)
-        self.coins.draw(win)
+        # Only the sprites intersecting the screen (plus a margin) are drawn
+        viewport = self.camera.viewport()
 
-        for player in self.players:
-            player.draw(win)
+        self.back_layers.draw(win, self.camera)  # Background, decoration and terrain
+        profiler.mark('draw layers')
+        self.camera.draw_group(win, self.coins_index.visible(viewport), self.coins_clock.image)
+        profiler.mark('draw tiles')
 
-        self.enemies.draw(win)
-        self.deep_water.draw(win)
-        self.foreground.draw(win)
-        self.doors.draw(win)
+        for player in self.players:
+            if viewport.colliderect(player.rect):
+                player.update_vision(self.terrain_grid)
+                player.draw(win, self.camera, position=self.interpolate(player, alpha))
+        profiler.mark('draw players')
+
+        win.blits([(enemy.image, self.camera.to_screen(self.interpolate(enemy, alpha))) for enemy in self.enemies
+                   if viewport.colliderect(enemy.rect)], doreturn=False)
+        profiler.mark('draw enemies')
+        self.camera.draw_group(win, self.deep_water_index.visible(viewport), self.deep_water_clock.image)
+        profiler.mark('draw tiles')
+        self.front_layers.draw(win, self.camera)  # Foreground and doors
+        profiler.mark('draw layers')
 
         self.ui.draw(win, nb_coins=self.nb_coins,
                      nb_goomba=self.nb_goomba,
                      nb_bee=self.nb_bee,
                      health=3)
-
-        pygame.display.flip()
+        if profiler.enabled:
+            self.ui.draw_profiler(win, profiler.statistics())
+        profiler.mark('draw ui')
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import xml.etree.ElementTree as ElementTree
+
+import numpy as np
+
+from assets import load_tile_image
+
+# Levels are compiled once from their TMX file into a binary artifact: the tile ids of every layer in one NumPy
+# array (memory-mapped when loaded) and a small JSON file with the tilesets, the layer names and the mtime/size/hash
+# of the source files (the TMX file and its external TSX tilesets). The artifact is rebuilt when one of them changes.
+CACHE_DIRECTORY = 'assets/levels/.cache'
+CACHE_VERSION = 2
+
+# Flags stored in the high bits of the TMX tile ids
+FLIPPED_HORIZONTALLY = 0x80000000
+FLIPPED_VERTICALLY = 0x40000000
+FLIPPED_DIAGONALLY = 0x20000000
+GID_MASK = 0x1FFFFFFF
+
+
+def level_path(current_level):
+    return 'assets/levels/level' + str(current_level) + '.tmx'
+
+
+def file_hash(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def source_entry(path):
+    # What the artifact remembers of a source file to notice when it changes
+    stat = os.stat(path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha1': file_hash(path)}
+
+
+def source_changed(path, entry):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return True
+    if entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+        return False
+    # The file was touched: it only changed if its content did
+    return entry['size'] != stat.st_size or entry['sha1'] != file_hash(path)
+
+
+def compile_level(tmx_path, cache_path):
+    # Parse the TMX file and write its artifact ('cache_path' + '.npy' and '.json')
+    root = ElementTree.parse(tmx_path).getroot()
+    width = int(root.get('width'))
+    height = int(root.get('height'))
+
+    tilesets = []
+    sources = {tmx_path: source_entry(tmx_path)}  # Source files of the artifact (the TMX file first)
+    for tileset in root.findall('tileset'):
+        base = os.path.dirname(tmx_path)
+        if tileset.get('source'):
+            # External tileset (.tsx file)
+            tsx_path = os.path.join(base, tileset.get('source'))
+            base = os.path.dirname(tsx_path)
+            data = ElementTree.parse(tsx_path).getroot()
+            sources[os.path.normpath(tsx_path)] = source_entry(tsx_path)
+        else:
+            data = tileset
+        image = data.find('image')
+        tilesets.append({
+            'firstgid': int(tileset.get('firstgid')),
+            'image': os.path.normpath(os.path.join(base, image.get('source'))),
+            'tilewidth': int(data.get('tilewidth')),
+            'tileheight': int(data.get('tileheight')),
+            'columns': int(data.get('columns')),
+            'tilecount': int(data.get('tilecount')),
+            'margin': int(data.get('margin', 0)),
+            'spacing': int(data.get('spacing', 0)),
+            'colorkey': image.get('trans'),
+        })
+
+    names = []
+    layers = []
+    for layer in root.findall('layer'):
+        data = layer.find('data')
+        if data.get('encoding') != 'csv':
+            raise ValueError(f'{tmx_path}: only csv encoded layers can be compiled')
+        gids = np.array([int(gid) for gid in data.text.replace('\n', '').split(',') if gid], dtype=np.uint32)
+        names.append(layer.get('name'))
+        layers.append(gids.reshape(height, width))
+
+    meta = {
+        'version': CACHE_VERSION,
+        'source': sources,
+        'width': width,
+        'height': height,
+        'layers': names,
+        'tilesets': tilesets,
+    }
+
+    # Write to temporary files first so that several processes can compile the same level at once
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    temporary_path = f'{cache_path}.{os.getpid()}.tmp'
+    with open(temporary_path + '.npy', 'wb') as file:
+        np.save(file, np.stack(layers))
+    with open(temporary_path + '.json', 'w') as file:
+        json.dump(meta, file)
+    os.replace(temporary_path + '.npy', cache_path + '.npy')
+    os.replace(temporary_path + '.json', cache_path + '.json')
+    return meta
+
+
+def read_meta(tmx_path, cache_path):
+    # Return the metadata of the artifact if it is up to date with the TMX file, None otherwise
+    try:
+        with open(cache_path + '.json', 'r') as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != CACHE_VERSION or not os.path.exists(cache_path + '.npy'):
+        return None
+
+    if any(source_changed(path, entry) for path, entry in meta['source'].items()):
+        return None
+    return meta
+
+
+def load_level(current_level):
+    # Return the compiled data of a level, compiling its TMX file first if needed
+    tmx_path = level_path(current_level)
+    cache_path = os.path.join(CACHE_DIRECTORY, os.path.splitext(os.path.basename(tmx_path))[0])
+    meta = read_meta(tmx_path, cache_path)
+    if meta is None:
+        meta = compile_level(tmx_path, cache_path)
+    return CompiledLevel(meta, np.load(cache_path + '.npy', mmap_mode='r'))
+
+
+class CompiledLevel:
+    # Compiled level, with the same interface as the parts of pytmx.TiledMap used by the game
+
+    def __init__(self, meta, layers):
+        self.width = meta['width']
+        self.height = meta['height']
+        self.tilesets = sorted(meta['tilesets'], key=lambda tileset: tileset['firstgid'])
+        self.layers = {name: CompiledLayer(self, layers[index]) for index, name in enumerate(meta['layers'])}
+
+    def get_layer_by_name(self, name):
+        return self.layers[name]
+
+    def get_tile_image(self, gid):
+        # Surface of a tile id (with its flip flags), cut from its tileset the same way as pytmx.
+        # Like pytmx, ids outside of their tileset (e.g. marker tiles of the Spawn layer) have no image.
+        tile_id = gid & GID_MASK
+        tileset = [tileset for tileset in self.tilesets if tileset['firstgid'] <= tile_id][-1]
+        local_id = tile_id - tileset['firstgid']
+        if local_id >= tileset['tilecount']:
+            return None
+        width, height = tileset['tilewidth'], tileset['tileheight']
+        x = tileset['margin'] + (local_id % tileset['columns']) * (width + tileset['spacing'])
+        y = tileset['margin'] + (local_id // tileset['columns']) * (height + tileset['spacing'])
+        return load_tile_image(tileset['image'], (x, y, width, height), bool(gid & FLIPPED_HORIZONTALLY),
+                               bool(gid & FLIPPED_VERTICALLY), bool(gid & FLIPPED_DIAGONALLY), tileset['colorkey'])
+
+
+class CompiledLayer:
+    # Tile ids of a layer, (rows, columns) array
+
+    def __init__(self, parent, data):
+        self.parent = parent
+        self.data = data
+
+    def iter_data(self):
+        # (x, y, gid) of every cell, row by row
+        for y, row in enumerate(self.data.tolist()):
+            for x, gid in enumerate(row):
+                yield x, y, gid
+
+    def tiles(self):
+        # (x, y, surface) of every non empty cell, row by row
+        for y, x in np.argwhere(self.data):
+            yield int(x), int(y), self.parent.get_tile_image(int(self.data[y, x]))
@@ -1,6 +1,7 @@
 import time
 
 import pygame
+from assets import load_font
 from ui import Button
 import os
 from constants import *
@@ -30,14 +31,14 @@ class Menu:
 
         # Load and configure assets for coins.
         font_path = 'assets/ui/Retro Gaming.ttf'
-        self.coin_font = pygame.font.Font(os.path.join(font_path), 25)
+        self.coin_font = load_font(os.path.join(font_path), 25)
         coin_path = 'assets/ui/coin_icon.png'
         self.coin_image = pygame.image.load(os.path.join(coin_path))
         self.coin_image = pygame.transform.scale(self.coin_image, (TILE_SIZE, TILE_SIZE))
         self.coin_image = self.coin_image.convert_alpha()
 
         # Create the title for the menu.
-        self.font = pygame.font.Font(os.path.join(font_path), 50)
+        self.font = load_font(os.path.join(font_path), 50)
         title = 'Select a level:'
         self.title_image = self.font.render(title, False, (0, 0, 0))
         self.title_rect = self.title_image.get_rect(centerx=WIDTH / 2, y=50)
@@ -137,4 +138,3 @@ class Menu:
             coin_surface = self.coins_info[index]
             pos = (button.x, button.y)
             win.blit(coin_surface, pos)
-        pygame.display.flip()
@@ -6,32 +6,53 @@ import neat
 import pygame
 
 import constants
-from constants import SFX_VOLUME
+from assets import load_frames
+from input_log import RIGHT, LEFT, JUMP
+from sounds import sounds
+from constants import PLAYER_WIDTH, PLAYER_SPEED, PLAYER_GRAVITY, PLAYER_JUMP_POWER, AI_OUTPUT_THRESHOLDS
+from vision import cast_rays, NB_RAYS, MAX_VISION_DISTANCE, LINE_SPACING, EYE_OFFSET
 
 
 class Player(pygame.sprite.Sprite):
 
     def __init__(self, net, genome):
         super().__init__()
-        self.points: list[list[tuple[int, int]]] = []
         self.font = pygame.font.SysFont('Arial', 20)
-        self.best_distance: int = 0
-        self.net = net
-        self.genome: neat.DefaultGenome = genome
         # Player's main characteristics
         self.lives = 3
-        self.current_lives = self.lives
-        self.width = 49
+        self.width = PLAYER_WIDTH
         self.height = 2 * self.width
-        self.speed = 550
-        self.gravity = 3000
-        self.jump_power = 1150
-        self.invincible = False
-        self.invincibility_timer = 0
+        self.speed = PLAYER_SPEED
+        self.gravity = PLAYER_GRAVITY
+        self.jump_power = PLAYER_JUMP_POWER
         self.invincibility_period = 1000
-        self.first_run = True
 
         self.rect = pygame.rect.Rect(0, 0, self.width, self.height)
+        self.position = pygame.math.Vector2(self.rect.topleft)  # Exact top left corner, the rect is rounded from it
+
+        # Loading player's animation sprites
+        self.animation_sprites = {'idle': (), 'jump': (), 'run': ()}
+        self.flipped_sprites = {'idle': (), 'jump': (), 'run': ()}  # Same frames facing left
+        self.resize_factor = self.width / 14
+        self.animation_speed = 10
+        self.load_sprites()
+
+        # AI vision
+        self.max_vision_distance = MAX_VISION_DISTANCE
+        self.line_spacing = LINE_SPACING
+
+        self.reset(net, genome)
+
+    def reset(self, net, genome):
+        # Put the player back in its starting state with a new network (the level reuses its players between
+        # generations instead of loading new ones)
+        self.net = net
+        self.genome: neat.DefaultGenome = genome
+        self.best_distance: int = 0
+        self.current_lives = self.lives
+        self.invincible = False
+        self.invincibility_timer = 0
+        self.previous_position = tuple(self.position)  # Position before the last physics step, for rendering
 
         # Utilities
         self.vertical_movement = 0
@@ -39,36 +60,26 @@ class Player(pygame.sprite.Sprite):
         self.on_ground = True
         self.facing_right = True
 
-        # Loading player's animation sprites
+        # Animation
         self.status = 'idle'
-        self.animation_sprites = {'idle': [], 'jump': [], 'run': []}
-        self.resize_factor = self.width / 14
         self.frame_index = 0
-        self.animation_speed = 10
-        self.load_sprites()
         self.image = self.animation_sprites[self.status][self.frame_index]
 
-        # Sound Effects (SFX)
-        self.jump_sfx = pygame.mixer.Sound('assets/sounds/Jump.wav')
-        self.jump_sfx.set_volume(SFX_VOLUME)
-
-        hurt_volume = 2 * SFX_VOLUME
-        self.hurt_sfx = pygame.mixer.Sound('assets/sounds/Hurt.wav')
-        self.hurt_sfx.set_volume(hurt_volume)
-
         # AI vision
-        self.max_vision_distance = 400
-        self.vision = [0, 0, 0, 0, 0, 0, 0, 0]
+        self.points: list[list[tuple[int, int]]] = []
+        self.vision = [0] * NB_RAYS
         self.ends = [None] * len(self.vision)
-        self.line_spacing = 60
+        # Eye position and network outputs of the last step, computed by the level for all the players at once
+        self.vision_eye = self.vision_start_point()
+        self.network_index = 0
+        self.network_output = [0.0, 0.0, 0.0]
+        self.controls = 0  # Controls of the last step (input_log bits)
+        self.forced_controls = None  # Controls of the next step given by the level when it replays an input log
 
     def load_sprites(self):
-        # Function to retrieve player's animation images from the sprite sheet
+        # Function to retrieve player's animation images from the sprite sheet (shared by all the players)
 
         sprite_sheet_path = 'assets/animations/Hero.png'
-        sprite_sheet = pygame.image.load(sprite_sheet_path).convert_alpha()
-        sprite_sheet = pygame.transform.scale_by(sprite_sheet, (
-            self.resize_factor))
 
         for key in self.animation_sprites:
             # Retrieve the coordinates on the sprite sheet for each type of animation
@@ -83,18 +94,18 @@ class Player(pygame.sprite.Sprite):
                 nb_sprite = 4
             else:
                 raise Exception('Invalid animation key')
-            for i in range(nb_sprite):
-                surface = pygame.Surface((self.width, self.height)).convert_alpha()
-                surface.set_colorkey((0, 0, 0))
-                surface.blit(sprite_sheet, (0, 0),
-                             (i * 16 * self.resize_factor, y * self.resize_factor, 16 * self.resize_factor,
-                              28 * self.resize_factor))
-                self.animation_sprites[key].append(surface)
+            frame_size = (self.width, self.height)
+            self.animation_sprites[key] = load_frames(sprite_sheet_path, self.resize_factor, frame_size, y, nb_sprite)
+            self.flipped_sprites[key] = load_frames(sprite_sheet_path, self.resize_factor, frame_size, y, nb_sprite,
+                                                    flipped=True)
 
     def animate(self, dt):
         # Function to handle the player's image to display based on the player's state and animation progress
-        # Player's state:
-        current_animation = self.animation_sprites[self.status]
+        # Player's state (the frames are flipped based on the player's direction):
+        if self.facing_right:
+            current_animation = self.animation_sprites[self.status]
+        else:
+            current_animation = self.flipped_sprites[self.status]
 
         # Animation loop (index for animation progression)
         self.frame_index += self.animation_speed * dt
@@ -104,57 +115,41 @@ class Player(pygame.sprite.Sprite):
         # Get the image for the animation
         image = current_animation[floor(self.frame_index)]
 
-        # Flip the image based on the player's direction
-        if not self.facing_right:
-            image = pygame.transform.flip(image, True, False)
-
-        # Blink when the player is invincible
+        # Blink when the player is invincible (on a copy, the frames are shared by all the players)
         if self.invincible:
             alpha = randint(0, 255)
+            image = image.copy()
             image.set_alpha(alpha)
-        else:
-            image.set_alpha(255)
 
         self.image = image
 
     def get_inputs(self):
-        self.horizontal_movement = 0
-        keys = pygame.key.get_pressed()
-        if constants.HUMAN_PLAYING:
-            if keys[pygame.K_RIGHT] or keys[pygame.K_a]:
-                self.horizontal_movement += self.speed
-                self.facing_right = True
-
-            if keys[pygame.K_LEFT] or keys[pygame.K_d]:
-                self.horizontal_movement -= self.speed
-                self.facing_right = False
-
-            if keys[pygame.K_SPACE]:
-                self.jump()
+        # Controls of this step (from the replayed input log, the keyboard or the network), as input_log bits
+        if self.forced_controls is not None:
+            controls = self.forced_controls
+        elif constants.HUMAN_PLAYING:
+            keys = pygame.key.get_pressed()
+            controls = ((keys[pygame.K_RIGHT] or keys[pygame.K_a]) * RIGHT
+                        | (keys[pygame.K_LEFT] or keys[pygame.K_d]) * LEFT
+                        | keys[pygame.K_SPACE] * JUMP)
         else:
-            inputs = self.get_ai_vision_inputs()
-            output = self.net.activate(inputs)
+            output = self.network_output
+            right_threshold, left_threshold, jump_threshold = AI_OUTPUT_THRESHOLDS
             # Bias for the right direction since the end of the level is on the right
-            if output[0] > 0.2:
-                self.horizontal_movement += self.speed
-                self.facing_right = True
-            if output[1] > 0.8:
-                self.horizontal_movement -= self.speed
-                self.facing_right = False
-            if output[2] > 0.5:
-                self.jump()
-
-    def get_ai_vision_inputs(self):
-        """Return the distance to the closest object in each direction"""
-        res = []
-        for i in range(len(self.vision)):
-            if self.vision[i] == 0:
-                res.append(0)
-            else:
-                distance = self.ends[i][0] - self.rect.centerx
-                score = 100 / distance if distance > 0 else 0
-                res.append(score)
-        return res
+            controls = ((output[0] > right_threshold) * RIGHT
+                        | (output[1] > left_threshold) * LEFT
+                        | (output[2] > jump_threshold) * JUMP)
+        self.controls = controls
+
+        self.horizontal_movement = 0
+        if controls & RIGHT:
+            self.horizontal_movement += self.speed
+            self.facing_right = True
+        if controls & LEFT:
+            self.horizontal_movement -= self.speed
+            self.facing_right = False
+        if controls & JUMP:
+            self.jump()
 
     def get_status(self):
         if self.on_ground:
@@ -169,85 +164,92 @@ class Player(pygame.sprite.Sprite):
         if self.on_ground:
             self.vertical_movement -= self.jump_power
             self.on_ground = False
-            self.jump_sfx.play()
+            sounds.play('jump')
 
     def apply_gravity(self, dt):
-        if not self.first_run:
-            self.vertical_movement += self.gravity * dt
-        else:
-            self.vertical_movement += self.gravity * 0.016
-            self.first_run = False
+        self.vertical_movement += self.gravity * dt
 
-    def check_invincibility(self):
+    def check_invincibility(self, dt):
+        # The timer counts simulated time (in ms) so the result does not depend on the machine speed
         if self.invincible:
-            now = pygame.time.get_ticks()
-            if now - self.invincibility_timer > self.invincibility_period:
+            self.invincibility_timer += dt * 1000
+            if self.invincibility_timer > self.invincibility_period:
                 self.invincible = False
 
     def take_damage(self):
         self.invincible = True
-        self.invincibility_timer = pygame.time.get_ticks()
-        self.hurt_sfx.play()
+        self.invincibility_timer = 0
+        sounds.play('hurt')
         self.current_lives -= 1
 
     def update(self, dt):
         self.get_inputs()
         self.apply_gravity(dt)
-        self.check_invincibility()
+        self.check_invincibility(dt)
         self.get_status()
         self.animate(dt)
         # Collisions are handled in the Level class to have access to the terrain blocks
 
-    def vision_start_point(self):
-        return self.rect.centerx, self.rect.centery - 25
+    def set_position(self, x, y):
+        # Move the player's top left corner to (x, y) (world coordinates, floats) and round its rect from it
+        self.position.update(x, y)
+        self.rect.topleft = (round(x), round(y))
+
+    def get_state(self):
+        # Values that change during a run, in the order of world_state.PLAYER_FIELDS
+        return (self.position.x, self.position.y, self.horizontal_movement, self.vertical_movement, self.on_ground,
+                self.facing_right, self.current_lives, self.invincible, self.invincibility_timer, self.best_distance,
+                self.status, self.frame_index)
+
+    def set_state(self, state):
+        # Put the player back in a state returned by get_state()
+        (x, y, self.horizontal_movement, self.vertical_movement, self.on_ground, self.facing_right,
+         self.current_lives, self.invincible, self.invincibility_timer, self.best_distance,
+         self.status, self.frame_index) = state
+        self.set_position(x, y)
+        self.previous_position = (x, y)
+        frames = self.animation_sprites if self.facing_right else self.flipped_sprites
+        self.image = frames[self.status][floor(self.frame_index)]
+        self.vision_eye = self.vision_start_point()
 
-    def update_vision(self, terrain: pygame.sprite.Group):
-        self.vision = [0] * len(self.vision)
-        self.ends: list[Optional[tuple[int, int]]] = [None] * len(self.vision)
-        self.points: list[list[tuple[int, int]]] = [[] for _ in range(len(self.vision))]
-        # collision between line and tile
-        self.interesting_rect = self.rect.copy().inflate(self.max_vision_distance * 1.5,
-                                                         self.line_spacing * len(self.vision)).move(200, 0)
-
-        interesting_tiles = [tile for tile in terrain if self.interesting_rect.colliderect(tile.rect)]
-        interesting_tiles.sort(key=lambda tile: tile.rect.x)
+    def vision_start_point(self):
+        return self.rect.centerx, self.rect.centery - EYE_OFFSET
 
+    def update_vision(self, terrain_grid):
+        """Cast the rays of the last step again to draw them (the inputs themselves come from the level)"""
         n = len(self.vision)
-        m = 20
-        start = self.vision_start_point()
+        xs, ys, hits, first = cast_rays(self.vision_eye, terrain_grid.occupancy)
+        self.vision = [int(hit) for hit in hits[0]]
+        self.ends: list[Optional[tuple[int, int]]] = [None] * n
+        self.points: list[list[tuple[int, int]]] = [[] for _ in range(n)]
         for i in range(n):
-            flag = False
-            end = (start[0] + self.max_vision_distance,
-                   start[1] - (n // 2 - i) * self.line_spacing)
-            for j in range(1, m + 1):
-                x = int(start[0] + j * (end[0] - start[0]) / m)
-                y = int(start[1] + j * (end[1] - start[1]) / m)
-                point = (x, y)
-                self.points[i].append(point)
-
-                for tile in interesting_tiles:
-                    if tile.rect.collidepoint(point):
-                        self.vision[i] = 1
-                        self.ends[i] = point
-                        flag = True
-                        break
-                if flag:
-                    break
-
-    def draw(self, win, draw_vision=True):
-        win.blit(self.image, self.rect)
+            last = first[0, i] if hits[0, i] else xs.shape[2] - 1
+            self.points[i] = list(zip(xs[0, i, :last + 1].tolist(), ys[0, i, :last + 1].tolist()))
+            if hits[0, i]:
+                self.ends[i] = self.points[i][-1]
+
+        # Area around the player in which the rays can hit a tile
+        self.interesting_rect = pygame.Rect(0, 0, self.width + self.max_vision_distance * 1.5,
+                                            self.height + self.line_spacing * n)
+        self.interesting_rect.center = (self.vision_eye[0], self.vision_eye[1] + EYE_OFFSET)
+        self.interesting_rect.move_ip(200, 0)
+
+    def draw(self, win, camera, position=None, draw_vision=True):
+        # 'position' is the (interpolated) world position to draw at, the rect position by default
+        x, y = camera.to_screen(self.rect.topleft if position is None else position)
+        win.blit(self.image, (x, y))
 
         # draw fitness on top
-        pygame.draw.rect(win, (0, 0, 0), (self.rect.x, self.rect.y - 20, 100, 20))
+        pygame.draw.rect(win, (0, 0, 0), (x, y - 20, 100, 20))
         text = self.font.render(f"Fitness: {self.genome.fitness}", True, (255, 255, 255))
-        win.blit(text, (self.rect.x, self.rect.y - 20))
+        win.blit(text, (x, y - 20))
 
         if draw_vision:
-            self.draw_vision(win)
+            self.draw_vision(win, camera)
 
-    def draw_vision(self, win):
+    def draw_vision(self, win, camera):
         if hasattr(self, "interesting_rect"):
-            pygame.draw.rect(win, (0, 0, 0), self.interesting_rect, 1)
+            pygame.draw.rect(win, (0, 0, 0), camera.apply(self.interesting_rect), 1)
         for i in range(n := len(self.vision)):
             if self.vision[i] == 1:
                 color = (255, 0, 0)
@@ -263,6 +265,6 @@ class Player(pygame.sprite.Sprite):
             else:
                 end = (self.vision_start_point()[0] + self.max_vision_distance,
                        self.vision_start_point()[1] - (n // 2 - i) * self.line_spacing)
-            pygame.draw.aaline(win, color, self.vision_start_point(), end)
+            pygame.draw.aaline(win, color, camera.to_screen(self.vision_start_point()), camera.to_screen(end))
             for point in self.points[i]:
-                pygame.draw.circle(win, color, (int(point[0]), int(point[1])), 2)
+                pygame.draw.circle(win, color, camera.to_screen(point), 2)
@@ -0,0 +1,68 @@
+import csv
+import time
+from collections import deque
+
+import numpy as np
+
+from constants import *
+
+
+class Profiler:
+    # Class that measures how long every phase of a frame takes.
+    # A phase ends with a call to mark(phase): the time since the previous mark (or since start()) is added to it,
+    # so a frame is instrumented with one call per phase. When the profiler is disabled, mark() returns right away.
+
+    def __init__(self, enabled=PROFILING, window=PROFILER_WINDOW):
+        self.enabled = enabled
+        self.frames = deque(maxlen=window)  # Duration of the phases (ms) of the last frames
+        self.totals = {}  # Total duration of every phase (s), in the order the phases were first seen
+        self.nb_frames = 0
+        self.current = {}  # Duration of the phases (s) of the frame being measured
+        self.last_time = time.perf_counter()
+
+    def start(self):
+        # Start timing from now: the time since the last mark belongs to no phase
+        if self.enabled:
+            self.last_time = time.perf_counter()
+
+    def mark(self, phase):
+        # The time since the last mark was spent in 'phase'
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.current[phase] = self.current.get(phase, 0) + now - self.last_time
+        self.last_time = now
+
+    def end_frame(self):
+        # Store the durations of the frame in the rolling window
+        if not self.enabled:
+            return
+        for phase, duration in self.current.items():
+            self.totals[phase] = self.totals.get(phase, 0) + duration
+        self.frames.append({phase: 1000 * duration for phase, duration in self.current.items()})
+        self.nb_frames += 1
+        self.current = {}
+
+    def statistics(self, percentile=PROFILER_PERCENTILE):
+        # Average and percentile duration (ms) of every phase over the last frames: {phase: (average, percentile)},
+        # plus the ones of the whole frame under 'total'
+        statistics = {}
+        for phase in self.totals:
+            durations = np.array([frame.get(phase, 0) for frame in self.frames])
+            statistics[phase] = (float(durations.mean()), float(np.percentile(durations, percentile)))
+        if self.frames:
+            durations = np.array([sum(frame.values()) for frame in self.frames])
+            statistics['total'] = (float(durations.mean()), float(np.percentile(durations, percentile)))
+        return statistics
+
+    def dump_csv(self, path):
+        # Write the durations (ms) of the phases of the last frames, one row per frame
+        phases = list(self.totals)
+        first_frame = self.nb_frames - len(self.frames)
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['frame'] + phases + ['total'])
+            for index, frame in enumerate(self.frames):
+                durations = [frame.get(phase, 0) for phase in phases]
+                writer.writerow([first_frame + index] + [f'{duration:.4f}' for duration in durations]
+                                + [f'{sum(durations):.4f}'])
@@ -0,0 +1,102 @@
+import os
+import queue
+import shutil
+import subprocess
+import threading
+
+import pygame
+
+from constants import *
+
+
+class FrameWriter:
+    # Writes rendered frames to disk from a background thread, so that the encoding does not slow the simulation
+    # down. 'path' is either a directory, filled with a PNG sequence (000000.png, 000001.png...), or a video file
+    # (any extension ffmpeg knows, e.g. .mp4) encoded by an ffmpeg process reading raw RGB frames from a pipe.
+    # The main thread only copies the pixels of a frame; when the writers fall more than 'queue_size' frames behind,
+    # write() waits for them instead of dropping frames. PNG files are encoded by 'nb_threads' threads at once
+    # (pygame releases the GIL while it saves an image), the ffmpeg pipe is fed by a single thread.
+
+    def __init__(self, path, size=(WIDTH, HEIGHT), fps=FPS, queue_size=RENDER_QUEUE_SIZE, nb_threads=RENDER_THREADS):
+        self.path = path
+        self.size = size
+        self.nb_frames = 0
+        self.error = None  # Exception raised in the writer thread, raised again in the main thread
+        self.process = None
+
+        if os.path.splitext(path)[1]:
+            ffmpeg = shutil.which('ffmpeg')
+            if ffmpeg is None:
+                raise RuntimeError(f'ffmpeg is needed to write {path} (give a directory to write PNG files instead)')
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            width, height = size
+            self.process = subprocess.Popen(
+                [ffmpeg, '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}',
+                 '-r', str(fps), '-i', '-', '-pix_fmt', 'yuv420p', path], stdin=subprocess.PIPE)
+        else:
+            os.makedirs(path, exist_ok=True)
+
+        self.frames = queue.Queue(maxsize=queue_size)
+        nb_threads = 1 if self.process is not None else nb_threads or os.cpu_count()
+        self.threads = [threading.Thread(target=self.write_frames, daemon=True) for _ in range(nb_threads)]
+        for thread in self.threads:
+            thread.start()
+
+    def write(self, surface):
+        # Queue a copy of the surface's pixels
+        if self.error is not None:
+            raise self.error
+        self.frames.put((self.nb_frames, pygame.image.tobytes(surface, 'RGB')))
+        self.nb_frames += 1
+
+    def write_frames(self):
+        # Writer thread: encode the frames until close() queues None
+        while (frame := self.frames.get()) is not None:
+            if self.error is not None:
+                continue  # Keep emptying the queue so that write() and close() never wait forever
+            index, pixels = frame
+            try:
+                if self.process is not None:
+                    self.process.stdin.write(pixels)
+                else:
+                    image = pygame.image.frombytes(pixels, self.size, 'RGB')
+                    pygame.image.save(image, os.path.join(self.path, f'{index:06d}.png'))
+            except Exception as error:
+                self.error = error
+
+    def close(self):
+        # Wait until every frame is written
+        for thread in self.threads:
+            self.frames.put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.process is not None:
+            self.process.stdin.close()
+            if self.process.wait() != 0 and self.error is None:
+                self.error = RuntimeError(f'ffmpeg failed to write {self.path}')
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def render_to_file(level, path, dt=FIXED_DT, max_time=None, follow=True):
+    # Simulate the level and draw every step onto an offscreen surface written to 'path' (see FrameWriter), as fast
+    # as the CPU and the writer allow. With 'follow', the camera stays centered on the player that went the furthest.
+    # The display must be initialised first (init_display(headless=True) is enough).
+    surface = pygame.Surface((WIDTH, HEIGHT))
+    steps = 0
+    max_steps = round(max_time / dt) if max_time is not None else None
+    with FrameWriter(path, surface.get_size(), round(1 / dt)) as writer:
+        while not level.generation_over() and (max_steps is None or steps < max_steps):
+            level.update(dt)
+            if follow and level.players:
+                level.camera.center_on(max(level.players, key=lambda player: player.best_distance).rect)
+            level.draw(surface)
+            writer.write(surface)
+            steps += 1
+    return steps
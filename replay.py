@@ -0,0 +1,99 @@
+# Replay of a recorded input log (see InputLog): the level is simulated again from its initial state with the
+# recorded controls, without NEAT or the networks.
+#
+#   python replay.py run.npz            # re-simulate as fast as possible and compare the fitnesses with the log
+#   python replay.py run.npz --window   # watch the replay at the normal speed
+#   python replay.py run.npz --video replay.mp4   # render the replay to a video file (or a directory of PNG files)
+import argparse
+import sys
+
+import pygame
+
+from constants import *
+from input_log import InputLog
+from recorder import render_to_file
+from simulation import init_display
+
+
+class ReplayGenome:
+    # Stands for the genome of a replayed player: only its fitness is used by the level
+    def __init__(self, key):
+        self.key = key
+        self.fitness = 0
+
+
+def create_replay_level(input_log):
+    # Level driven by the log, with one player per recorded player
+    from level import Level
+
+    genomes = [(index, ReplayGenome(index)) for index in range(input_log.nb_players)]
+    level = Level(input_log.current_level, None, None, genomes, None)
+    level.start_replay(input_log)
+    return level
+
+
+def replay(input_log):
+    # Simulate the whole log headlessly, as fast as the CPU allows, and return the level at the end of the run
+    init_display(headless=True)
+    level = create_replay_level(input_log)
+    for _ in range(len(input_log)):
+        if level.generation_over():
+            break
+        level.update(input_log.dt)
+    return level
+
+
+def watch(input_log):
+    # Replay the log in a window at the normal speed
+    win = init_display(headless=False)
+    level = create_replay_level(input_log)
+    clock = pygame.time.Clock()
+    for _ in range(len(input_log)):
+        if any(event.type == pygame.QUIT for event in pygame.event.get()) or level.generation_over():
+            break
+        level.update(input_log.dt)
+        level.draw(win)
+        pygame.display.flip()
+        clock.tick(FPS)
+    return level
+
+
+def render(input_log, path):
+    # Render the replay to a video file or a directory of PNG files, as fast as possible
+    init_display(headless=True)
+    level = create_replay_level(input_log)
+    render_to_file(level, path, input_log.dt, max_time=len(input_log) * input_log.dt)
+    return level
+
+
+def fitnesses(level):
+    return [genome.fitness for _, genome in level.genomes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay of a recorded run')
+    parser.add_argument('log', help='input log saved by InputLog.save')
+    parser.add_argument('--window', action='store_true', help='watch the replay instead of running it headlessly')
+    parser.add_argument('--video', metavar='PATH', help='render the replay to a video file or a directory of PNG files')
+    args = parser.parse_args()
+
+    input_log = InputLog.load(args.log)
+    if args.video:
+        level = render(input_log, args.video)
+    elif args.window:
+        level = watch(input_log)
+    else:
+        level = replay(input_log)
+
+    print(f'level {input_log.current_level}: {len(input_log)} steps of {input_log.nb_players} players')
+    if input_log.fitnesses is not None:
+        if fitnesses(level) != input_log.fitnesses:
+            print('The replay does not reach the recorded fitnesses:')
+            print('  recorded', input_log.fitnesses)
+            print('  replayed', fitnesses(level))
+            sys.exit(1)
+        print('The replay reaches the recorded fitnesses')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import os
+
+import pygame
+
+from constants import *
+from sounds import sounds
+
+# Video driver chosen by the user before we start swapping to the dummy one
+DEFAULT_VIDEO_DRIVER = os.environ.get('SDL_VIDEODRIVER')
+
+
+def init_display(headless):
+    # (Re)initialise the display, either as a real window or as SDL's dummy driver.
+    # The dummy driver opens no window but still allows convert()/convert_alpha() on the loaded sprites.
+    pygame.display.quit()
+    if headless:
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        os.environ['SDL_AUDIODRIVER'] = 'dummy'
+    elif DEFAULT_VIDEO_DRIVER is None:
+        os.environ.pop('SDL_VIDEODRIVER', None)
+    else:
+        os.environ['SDL_VIDEODRIVER'] = DEFAULT_VIDEO_DRIVER
+    pygame.display.init()
+    pygame.font.init()
+    # Headless runs play no sound: the sounds are not even loaded
+    sounds.enabled = not headless
+    if not headless and not pygame.mixer.get_init():
+        pygame.mixer.init()
+
+    if headless:
+        return pygame.display.set_mode((1, 1))
+    return pygame.display.set_mode((WIDTH, HEIGHT))
+
+
+def run_headless(level, dt=FIXED_DT, max_time=None):
+    # Step the level as fast as the CPU allows until the generation is over or
+    # 'max_time' seconds have been simulated: no events, no drawing, no clock throttling
+    steps = 0
+    max_steps = round(max_time / dt) if max_time is not None else None
+    while not level.generation_over() and (max_steps is None or steps < max_steps):
+        level.update(dt)
+        level.profiler.end_frame()
+        steps += 1
+    return steps
+
+
+def run_from_state(level, state, genomes, config, dt=FIXED_DT, max_time=None):
+    # Branching rollout: fork the level from a WorldState (see Level.save_state) with new genomes and simulate them
+    # headlessly. The same state can be restored any number of times to compare several candidates from it.
+    level.restore_state(state, genomes, config)
+    return run_headless(level, dt, max_time)
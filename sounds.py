@@ -0,0 +1,46 @@
+import pygame
+
+from constants import *
+
+# File and volume of every sound of the game
+SOUNDS = {
+    'jump': ('assets/sounds/Jump.wav', SFX_VOLUME),
+    'hurt': ('assets/sounds/Hurt.wav', 2 * SFX_VOLUME),
+    'explosion': ('assets/sounds/Explosion.wav', SFX_VOLUME),
+    'coin': ('assets/sounds/coin_2.mp3', 2 * SFX_VOLUME),
+    'level_music': ('assets/sounds/level_music.wav', MUSIC_VOLUME),
+    'menu_music': ('assets/sounds/menu_music.wav', MUSIC_VOLUME),
+    'win_music': ('assets/sounds/victory_music.mp3', 4 * MUSIC_VOLUME),
+    'death_music': ('assets/sounds/death_music.mp3', 4 * MUSIC_VOLUME),
+}
+
+
+class SoundManager:
+    # Plays the sounds of the game by name. Every file is decoded once, the first time it is played, and shared
+    # by all the players and enemies. A muted sound (volume 0) is never loaded, and nothing is loaded or played
+    # when the manager is disabled (headless simulations) or when there is no mixer.
+
+    def __init__(self, sounds=SOUNDS):
+        self.files = sounds
+        self.enabled = True
+        self.sounds: dict[str, pygame.mixer.Sound] = {}  # Sounds loaded so far
+
+    def play(self, name, loops=0):
+        path, volume = self.files[name]
+        if not self.enabled or volume == 0 or not pygame.mixer.get_init():
+            return
+        sound = self.sounds.get(name)
+        if sound is None:
+            sound = self.sounds[name] = pygame.mixer.Sound(path)
+            sound.set_volume(volume)
+        sound.play(loops=loops)
+
+    def stop(self, name):
+        # A sound that was never played has nothing to stop
+        sound = self.sounds.get(name)
+        if sound is not None:
+            sound.stop()
+
+
+# Sounds of the whole process
+sounds = SoundManager()
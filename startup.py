@@ -0,0 +1,73 @@
+# Cold startup report: times every phase from the start of a fresh interpreter to the first frame of the menu and
+# fails (exit code 1) when the total goes over the budget. The game runs on SDL's dummy drivers, without window.
+#
+#   python startup.py                 # report with the STARTUP_BUDGET budget
+#   python startup.py --budget 0.5    # another budget (seconds)
+import time
+
+start = time.perf_counter()
+
+import argparse
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+# Modules that must not be imported before a level is created
+DEFERRED_MODULES = ('neat', 'level', 'player', 'enemy', 'batch_network', 'gameover')
+
+
+def measure():
+    # Duration (s) of every phase of the startup of main.py, in order
+    phases = {}
+    last = start
+
+    def mark(phase):
+        nonlocal last
+        now = time.perf_counter()
+        phases[phase] = now - last
+        last = now
+
+    import pygame
+    mark('import pygame')
+    from constants import WIDTH, HEIGHT
+    from game import Game
+    mark('import game')
+    pygame.init()
+    win = pygame.display.set_mode((WIDTH, HEIGHT))
+    mark('display')
+    game = Game(win)
+    mark('game')
+    game.draw(win)
+    mark('first frame')
+    return phases
+
+
+def main():
+    from constants import STARTUP_BUDGET
+
+    parser = argparse.ArgumentParser(description='Cold startup time of the game')
+    parser.add_argument('--budget', type=float, default=STARTUP_BUDGET, help='maximum startup time (s)')
+    args = parser.parse_args()
+
+    phases = measure()
+    total = sum(phases.values())
+    for phase, duration in phases.items():
+        print(f'{phase:<14} {1000 * duration:8.1f} ms')
+    print(f'{"total":<14} {1000 * total:8.1f} ms (budget {1000 * args.budget:.0f} ms)')
+
+    failed = False
+    imported = [name for name in DEFERRED_MODULES if name in sys.modules]
+    if imported:
+        print('Imported before a level is created:', ', '.join(imported))
+        failed = True
+    if total > args.budget:
+        print('Over the startup budget')
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
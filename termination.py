@@ -0,0 +1,73 @@
+import numpy as np
+
+from constants import *
+
+
+class TerminationPolicy:
+    # Decides when the players of a generation stop being simulated, in simulated time (not real time):
+    # - a player whose best distance has not increased for 'stall_time' seconds is stopped,
+    # - the generation is over after 'max_time' seconds,
+    # - or when the best fitness of the generation has not improved for 'plateau_time' seconds.
+    # A limit set to 0 (or None) is disabled.
+
+    def __init__(self, nb_players, stall_time=STALL_TIME, max_time=MAX_GENERATION_TIME,
+                 plateau_time=FITNESS_PLATEAU_TIME):
+        self.stall_time = stall_time
+        self.max_time = max_time
+        self.plateau_time = plateau_time
+        self.reset(nb_players)
+
+    def reset(self, nb_players):
+        self.time = 0
+        self.dt = FIXED_DT
+        self.best_distance = np.zeros(nb_players, dtype=np.int64)  # Best distance known for every player
+        self.last_progress = np.zeros(nb_players)  # Time at which every player last went further
+        self.best_fitness = None
+        self.last_improvement = 0  # Time at which the best fitness of the generation last improved
+
+    def save_state(self):
+        # Copy of the progress of the generation (see WorldState)
+        return (self.time, self.dt, self.best_distance.copy(), self.last_progress.copy(), self.best_fitness,
+                self.last_improvement)
+
+    def restore_state(self, state):
+        self.time, self.dt, best_distance, last_progress, self.best_fitness, self.last_improvement = state
+        self.best_distance = best_distance.copy()
+        self.last_progress = last_progress.copy()
+
+    def step(self, dt, rows, best_distance, fitness):
+        # Record one physics step of the living players 'rows' (indices of the players) given their best distance
+        # and fitness. Return a bool array telling which of these players have stalled and must be stopped.
+        self.time += dt
+        self.dt = dt
+        progress = best_distance > self.best_distance[rows]
+        self.best_distance[rows] = np.where(progress, best_distance, self.best_distance[rows])
+        self.last_progress[rows[progress]] = self.time
+
+        if len(fitness):
+            best_fitness = max(fitness)
+            if self.best_fitness is None or best_fitness > self.best_fitness:
+                self.best_fitness = best_fitness
+                self.last_improvement = self.time
+
+        if not self.stall_time:
+            return np.zeros(len(rows), dtype=bool)
+        return self.time - self.last_progress[rows] >= self.stall_time
+
+    def steps_before_plateau(self, dt):
+        # Number of steps after which the plateau ends the generation if the best fitness does not improve meanwhile
+        # (counted with the same float additions as step())
+        if not self.plateau_time:
+            return float('inf')
+        time = self.time
+        steps = 0
+        while time - self.last_improvement < self.plateau_time:
+            time += dt
+            steps += 1
+        return steps
+
+    def generation_over(self):
+        # True when the remaining players must be stopped as well
+        if self.max_time and self.time >= self.max_time - self.dt / 2:  # Half a step for the float rounding errors
+            return True
+        return bool(self.plateau_time) and self.time - self.last_improvement >= self.plateau_time
@@ -1,6 +1,8 @@
+import numpy as np
 import pygame.sprite
+from assets import load_frames, load_sprite_sheet, scale_image
 from constants import *  # Importing constants (not shown in the provided code).
-from math import floor
+from math import ceil, floor
 
 
 # Define a class called "Tile" that inherits from pygame.sprite.Sprite.
@@ -10,52 +12,120 @@ class Tile(pygame.sprite.Sprite):
 
         self.width = TILE_SIZE  # Set the width of the tile to a constant value (TILE_SIZE).
 
-        # Load the image and resize it to fit the tile size.
+        # Load the image and resize it to fit the tile size (shared by the tiles using the same image).
         self.resize_factor = TILE_SIZE / image.get_width()
-        self.image = pygame.transform.scale_by(image, self.resize_factor)
+        self.image = scale_image(image, self.resize_factor)
 
         self.rect = self.image.get_rect()
         self.rect.x = x * TILE_SIZE  # Set the x-coordinate of the tile.
         self.rect.y = y * TILE_SIZE  # Set the y-coordinate of the tile.
 
 
-# Define a class called "AnimatedTile" that inherits from the "Tile" class.
-class AnimatedTile(Tile):
-    def __init__(self, x, y, image, path):
-        super().__init__(x, y, image)
-
+# Define a class called "AnimationClock" that animates all the tiles using the same sprite sheet at once:
+# there is a single frame index per animation type instead of one per tile.
+class AnimationClock:
+    def __init__(self, path):
         self.path = path  # Store the path to a sprite sheet image.
         self.tile_width = 16  # Set the width of a single tile in the sprite sheet.
         self.resize_factor = TILE_SIZE / self.tile_width  # Calculate the resize factor.
 
         self.frame_index = 0  # Initialize the frame index for animation.
-        self.animation_speed = 0.1  # Set the animation speed.
-        self.animation_sprites = list()  # Create an empty list to store animation frames.
+        self.animation_speed = 0.1  # Set the animation speed (frames per tick).
+        self.animation_sprites = ()  # Animation frames, shared by all the clocks using the same sprite sheet.
         self.load_sprites()  # Load animation frames from the sprite sheet.
 
-    # Load animation frames from the sprite sheet.
+    # Load animation frames from the sprite sheet (only the first clock actually loads them).
     def load_sprites(self):
-        sprite_sheet = pygame.image.load(self.path).convert_alpha()
-        nb_sprites = int(sprite_sheet.get_width() / self.tile_width)
-        sprite_sheet = pygame.transform.scale_by(sprite_sheet, self.resize_factor)
-
-        for x in range(nb_sprites):
-            surface = pygame.Surface((self.width, self.width), pygame.SRCALPHA).convert_alpha()
-            surface.set_colorkey((0, 0, 0))
-            surface.blit(sprite_sheet, (0, 0), (x * TILE_SIZE, 0, TILE_SIZE, TILE_SIZE))
+        nb_sprites = load_sprite_sheet(self.path, self.resize_factor).get_width() // TILE_SIZE
+        self.animation_sprites = load_frames(self.path, self.resize_factor, (TILE_SIZE, TILE_SIZE), 0, nb_sprites,
+                                             cell_size=(self.tile_width, self.tile_width), flags=pygame.SRCALPHA)
 
-            self.animation_sprites.append(surface)
-
-    # Function to animate the tile by changing its image based on the animation progress.
-    def animate(self):
+    # Function to advance the animation of every tile of this type by one tick.
+    def tick(self):
         # Animation loop (progress index of the animation).
         self.frame_index += self.animation_speed
         if self.frame_index >= len(self.animation_sprites):
             self.frame_index = 0
 
-        # Get the current animation frame.
-        self.image = self.animation_sprites[floor(self.frame_index)]
+    # Current animation frame, to draw every tile of this type with.
+    @property
+    def image(self):
+        return self.animation_sprites[floor(self.frame_index)]
+
+
+# Define a class called "AnimatedTile" that inherits from the "Tile" class.
+# Its image is not updated: the level draws it with the current frame of its clock.
+class AnimatedTile(Tile):
+    def __init__(self, x, y, image, clock):
+        super().__init__(x, y, image)
+
+        self.clock = clock  # Store the clock shared by all the tiles of this animation.
+
+
+# Define a class called "TileGrid" that indexes the solid tiles of a layer by their tile coordinates.
+class TileGrid:
+    def __init__(self, width, height):
+        self.width = width  # Number of columns of the map.
+        self.height = height  # Number of rows of the map.
+        self.solid = [[False] * width for _ in range(height)]  # Solid flag of every (row, column) cell.
+        self.occupancy = np.zeros((height, width), dtype=bool)  # Same flags as a NumPy array, for the AI vision.
+
+    # Build the grid once from a TMX layer: every cell holding a tile is solid.
+    @classmethod
+    def from_layer(cls, layer, width, height):
+        grid = cls(width, height)
+        for x, y, gid in layer.iter_data():
+            if gid:
+                grid.solid[y][x] = True
+                grid.occupancy[y, x] = True
+        return grid
+
+    # Return True if the cell at (column, row) holds a solid tile, cells outside the map are empty.
+    def is_solid(self, column, row):
+        return 0 <= column < self.width and 0 <= row < self.height and self.solid[row][column]
+
+    # Return True if one of the cells of 'column' between the rows 'top' and 'bottom' (included) is solid.
+    def column_blocked(self, column, top, bottom):
+        return any(self.is_solid(column, row) for row in range(top, bottom + 1))
+
+    # Return True if one of the cells of 'row' between the columns 'left' and 'right' (included) is solid.
+    def row_blocked(self, row, left, right):
+        return any(self.is_solid(column, row) for column in range(left, right + 1))
+
+    # Swept collision: move a box of 'size' from 'position' (top left corner, world coordinates, floats) horizontally
+    # to 'x' and stop it against the first solid tile on the way, however far it goes in one step.
+    # Return the reached x and True if a tile was hit.
+    def sweep_x(self, position, size, x):
+        left, top = position
+        width, height = size
+        top_row = floor(top / TILE_SIZE)
+        bottom_row = ceil((top + height) / TILE_SIZE) - 1
+        if x > left:
+            # Columns entered by the right side of the box, from left to right
+            for column in range(ceil((left + width) / TILE_SIZE), ceil((x + width) / TILE_SIZE)):
+                if self.column_blocked(column, top_row, bottom_row):
+                    return column * TILE_SIZE - width, True
+        elif x < left:
+            # Columns entered by the left side of the box, from right to left
+            for column in range(floor(left / TILE_SIZE) - 1, floor(x / TILE_SIZE) - 1, -1):
+                if self.column_blocked(column, top_row, bottom_row):
+                    return (column + 1) * TILE_SIZE, True
+        return x, False
 
-    # Update method to be called in the game loop, which updates the animation.
-    def update(self):
-        self.animate()
+    # Same as sweep_x for a vertical movement to 'y'. Return the reached y and True if a tile was hit.
+    def sweep_y(self, position, size, y):
+        left, top = position
+        width, height = size
+        left_column = floor(left / TILE_SIZE)
+        right_column = ceil((left + width) / TILE_SIZE) - 1
+        if y > top:
+            # Rows entered by the bottom of the box, from top to bottom
+            for row in range(ceil((top + height) / TILE_SIZE), ceil((y + height) / TILE_SIZE)):
+                if self.row_blocked(row, left_column, right_column):
+                    return row * TILE_SIZE - height, True
+        elif y < top:
+            # Rows entered by the top of the box, from bottom to top
+            for row in range(floor(top / TILE_SIZE) - 1, floor(y / TILE_SIZE) - 1, -1):
+                if self.row_blocked(row, left_column, right_column):
+                    return (row + 1) * TILE_SIZE, True
+        return y, False
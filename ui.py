@@ -1,5 +1,6 @@
 import os
 import pygame
+from assets import load_font
 from constants import *
 
 
@@ -21,7 +22,8 @@ class LevelUI:
 
         # Font and coin counter size
         font_path = 'assets/ui/Retro Gaming.ttf'
-        self.font = pygame.font.Font(os.path.join(font_path), 30)
+        self.font = load_font(os.path.join(font_path), 30)
+        self.profiler_font = load_font(os.path.join(font_path), 14)
 
         self.enemy_path = "assets/ui/enemy.png"
         self.enemy_image = pygame.image.load(self.enemy_path)
@@ -71,6 +73,25 @@ class LevelUI:
         self.draw_health(win, health)
         self.draw_coins_counter(win, nb_coins)
 
+    def draw_profiler(self, win, statistics):
+        # Display the average and percentile duration (ms) of every phase of the frame (see Profiler.statistics)
+        rows = [('phase', 'avg ms', f'p{PROFILER_PERCENTILE} ms')]
+        for phase, (average, percentile) in statistics.items():
+            rows.append((phase, f'{average:.2f}', f'{percentile:.2f}'))
+
+        line_height = self.profiler_font.get_linesize()
+        background = pygame.Surface((300, line_height * len(rows) + 10))
+        background.set_alpha(160)
+        x = WIDTH - background.get_width() - 10
+        win.blit(background, (x, 10))
+        for i, (phase, average, percentile) in enumerate(rows):
+            y = 15 + i * line_height
+            win.blit(self.profiler_font.render(phase, False, (255, 255, 255)), (x + 5, y))
+            # Numbers aligned on the right of their column
+            for text, right in ((average, x + 210), (percentile, x + 295)):
+                text_surface = self.profiler_font.render(text, False, (255, 255, 255))
+                win.blit(text_surface, (right - text_surface.get_width(), y))
+
 
 class Button:
     # Class for creating buttons in the game
@@ -85,7 +106,7 @@ class Button:
         self.click = click
 
         self.text = text
-        self.font = pygame.font.Font(os.path.join(font_path), 50)
+        self.font = load_font(os.path.join(font_path), 50)
 
         self.color = (105, 222, 222)
         self.outline_color = (0, 0, 0)
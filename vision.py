@@ -0,0 +1,51 @@
+import numpy as np
+
+from constants import *
+
+# AI vision: 8 rays going to the right of the player's eye, from 240 pixels up to 180 pixels down,
+# each sampled at 20 points. A ray stops at the first point inside a terrain tile.
+NB_RAYS = 8
+NB_POINTS = 20
+MAX_VISION_DISTANCE = 400
+LINE_SPACING = 60
+EYE_OFFSET = 25  # Height of the eye above the center of the player
+
+# Offset of the end of every ray from the eye
+RAYS_DX = np.full(NB_RAYS, MAX_VISION_DISTANCE)
+RAYS_DY = -(NB_RAYS // 2 - np.arange(NB_RAYS)) * LINE_SPACING
+
+# Offset of every sample point from the eye, shape (rays, points)
+STEPS = np.arange(1, NB_POINTS + 1)
+POINTS_DX = STEPS * RAYS_DX[:, np.newaxis] / NB_POINTS
+POINTS_DY = STEPS * RAYS_DY[:, np.newaxis] / NB_POINTS
+
+
+def cast_rays(eyes, occupancy):
+    # Cast the rays of every eye at once against a boolean (rows, columns) grid of the solid tiles.
+    # 'eyes' is an (n, 2) array of world positions. Return the sample points 'xs' and 'ys', shape (n, rays, points),
+    # a boolean (n, rays) 'hits' array and the index of the first point of each ray inside a tile.
+    eyes = np.asarray(eyes).reshape(-1, 2)
+    xs = np.trunc(eyes[:, 0, np.newaxis, np.newaxis] + POINTS_DX).astype(np.int64)
+    ys = np.trunc(eyes[:, 1, np.newaxis, np.newaxis] + POINTS_DY).astype(np.int64)
+
+    # Look up the tile under every sample point, points outside the map see nothing
+    rows, columns = occupancy.shape
+    tile_x = xs // TILE_SIZE
+    tile_y = ys // TILE_SIZE
+    inside = (tile_x >= 0) & (tile_x < columns) & (tile_y >= 0) & (tile_y < rows)
+    solid = inside & occupancy[tile_y.clip(0, rows - 1), tile_x.clip(0, columns - 1)]
+
+    hits = solid.any(axis=2)
+    first = solid.argmax(axis=2)
+    return xs, ys, hits, first
+
+
+def vision_inputs(eyes, occupancy):
+    # Network inputs of every eye, shape (n, rays): 100 / horizontal distance to the first tile hit by each ray,
+    # 0 if the ray hits nothing
+    eyes = np.asarray(eyes).reshape(-1, 2)
+    xs, ys, hits, first = cast_rays(eyes, occupancy)
+    ends_x = np.take_along_axis(xs, first[:, :, np.newaxis], axis=2)[:, :, 0]
+    distances = ends_x - eyes[:, 0, np.newaxis]
+    visible = hits & (distances > 0)
+    return np.where(visible, 100 / np.where(visible, distances, 1), 0.0)
@@ -0,0 +1,29 @@
+# Order of the values of a player's state (see Player.get_state)
+PLAYER_FIELDS = ('x', 'y', 'horizontal_movement', 'vertical_movement', 'on_ground', 'facing_right', 'current_lives',
+                 'invincible', 'invincibility_timer', 'best_distance', 'status', 'frame_index')
+
+# Order of the values of an enemy's state (see Enemy.get_state)
+ENEMY_FIELDS = ('x', 'y', 'horizontal_movement', 'facing_right', 'status', 'frame_index')
+
+
+class WorldState:
+    # Snapshot of everything that changes while a level runs, taken by Level.save_state and restored by
+    # Level.restore_state. It only holds numbers, strings and booleans (no sprites or surfaces) so it is small,
+    # fast to copy and can be pickled to the worker processes.
+
+    def __init__(self, players, player_rows, fitnesses, enemies, enemies_alive, coins, counters, camera, clocks,
+                 termination):
+        self.players = players  # State of every living player, tuples in the order of PLAYER_FIELDS
+        self.player_rows = player_rows  # Row of every living player in the batched network (its genome)
+        self.fitnesses = fitnesses  # Fitness of the genome of every living player
+        self.enemies = enemies  # State of every enemy of the level, tuples in the order of ENEMY_FIELDS
+        self.enemies_alive = enemies_alive  # False for the enemies that have been killed
+        self.coins = coins  # False for the coins that have been collected
+        self.counters = counters  # Number of coins, goombas, bees and isibs collected/killed
+        self.camera = camera  # Camera position
+        self.clocks = clocks  # Frame index of the animation clocks
+        self.termination = termination  # State of the termination policy
+
+    def player(self, index=0):
+        # State of a player as a dictionary
+        return dict(zip(PLAYER_FIELDS, self.players[index]))